@@ -1,6 +1,7 @@
 from __future__ import print_function
 from visbrain import Sleep
 import os
+import numpy as np
 from distutils.sysconfig import get_python_lib
 from warnings import warn
 
@@ -38,4 +39,139 @@ def test_ico_file():
         topopath = ",visbrain,sleep,ico,sleep.svg"
         file = os.path.join(*topopath.split(","))
         warn('Local version passed for sleep ico file')
-        assert os.path.isfile(file)
\ No newline at end of file
+        assert os.path.isfile(file)
+
+
+def test_movingaverage():
+    """Test moving averages against np.convolve."""
+    from visbrain.utils import movingaverage
+    # Short windows on a piecewise constant signal (ties with threshold) :
+    x = np.repeat([0., 1., .3, .7, 1., .2, .7], 2000)
+    for window in [100, 200, 2560]:
+        w = int(window / 10.)
+        sma = np.convolve(x, np.repeat(1., w) / w, 'same')
+        assert np.array_equal(movingaverage(x, window, 100.) >= .7, sma >= .7)
+    # Long window on a long signal :
+    x = np.random.RandomState(0).rand(10 ** 6) + 1e3
+    sma = np.convolve(x, np.repeat(1., 3000) / 3000, 'same')
+    assert np.allclose(movingaverage(x, 30000, 100.), sma, rtol=0, atol=1e-9)
+
+
+def test_event_features():
+    """Test features computed over the samples of each event."""
+    from visbrain.utils.sleep.event import (_events_duration,
+                                            _events_removal,
+                                            _event_amplitude)
+    x = np.array([0., 5., 1., 0., 9., 0., 2., -3., 7., 0.])
+    start, stop = np.array([1, 6]), np.array([2, 9])
+    # Amplitude only uses the samples of each event :
+    amp, dist = _event_amplitude(x, start, stop, 1000.)
+    assert np.array_equal(amp, [4., 10.])
+    assert np.array_equal(dist, [1., 1.])
+    # The last sample of each event is counted and kept :
+    assert np.array_equal(_events_duration(start, stop, 1000.)[1], [2., 4.])
+    assert np.array_equal(_events_removal(start, stop, [False, True])[1],
+                          [9])
+
+
+def test_mtdetect_amplitude():
+    """Test that muscle twitches are selected using their amplitude."""
+    from visbrain.utils.sleep.detection import mtdetect
+    sf = 1000.
+    x = np.random.RandomState(0).randn(120000)
+    burst = 50. * np.sin(2 * np.pi * 20 * np.arange(1200) / sf)
+    for k in range(10000, 110000, 10000):
+        x[k:k + 1200] += burst
+    hypno = np.zeros(len(x))
+    assert mtdetect(x, sf, 2., hypno, False)[1] == 10
+    assert mtdetect(x, sf, 2., hypno, False, max_amp=50.)[1] == 0
+
+
+def test_detection_memory():
+    """Test the memory budget shared by detection contexts."""
+    from visbrain.utils import DetectionContext, FeatureMemory
+    x = np.random.RandomState(0).rand(2, 10000)
+    memory = FeatureMemory(max_bytes=5 * x[0].nbytes)
+    ctx = [DetectionContext(k, 100., memory=memory) for k in x]
+    # Channel data are counted against the budget :
+    assert memory.data_nbytes == x.nbytes
+    for f in [2., 4., 6., 8.]:
+        ctx[0].envelope(f)
+        ctx[1].envelope(f)
+    # Least recently used features of both channels are dropped :
+    assert len(memory) == 3 and len(ctx[0]) == 1 and len(ctx[1]) == 2
+    assert memory.nbytes + memory.data_nbytes <= memory.max_bytes
+    ctx[1].close()
+    assert len(memory) == 1 and memory.data_nbytes == x[0].nbytes
+
+
+def test_movingstd():
+    """Test moving standard deviations against a windowed np.std."""
+    from visbrain.utils import movingstd
+    rng = np.random.RandomState(0)
+    for offset in [0., 1e4, 1e6]:
+        x = offset + 1e-2 * rng.randn(20000)
+        for window in [100, 2000]:
+            std = movingstd(x, window, 1000.)
+            # Windows of movingaverage start at window // 2 samples before :
+            idx = np.arange(window, len(x) - window, 97)
+            ref = [np.std(x[k - window // 2:k - window // 2 + window])
+                   for k in idx]
+            assert np.allclose(std[idx], ref, rtol=1e-9, atol=0)
+
+
+def test_events_overlap():
+    """Test the spindle lookup of K-complexes against the previous loop."""
+    from visbrain.utils.sleep.event import (_events_from_index,
+                                            _events_overlap)
+
+    def _loop(start, idx_spin, step):
+        # Previous loop of kcdetect (np.in1d being np.isin for vectors) :
+        return np.array([np.isin(np.arange(st - step, st + step, 1),
+                                 idx_spin).any() for st in start], dtype=bool)
+
+    step = 0.5 * 4 * 10.  # range_spin_sec = 4 and sf = 10.
+    rng = np.random.RandomState(0)
+    # Random candidates and spindles :
+    for k in range(20):
+        start = np.flatnonzero(rng.rand(2000) < .02)
+        idx_spin = np.flatnonzero(np.repeat(rng.rand(400) < .05, 5))
+        ovlp = _events_overlap(np.ceil(start - step), start + step,
+                               *_events_from_index(idx_spin))
+        assert np.array_equal(ovlp, _loop(start, idx_spin, step))
+    # Spindles touching the window start / end, or just outside of it
+    # (windows are [80, 120[, [280, 320[, [480, 520[ and [680, 720[) :
+    start = np.array([100, 300, 500, 700])
+    idx_spin = np.r_[70:81, 319:330, 450:480, 520:530, 900:910]
+    ovlp = _events_overlap(np.ceil(start - step), start + step,
+                           *_events_from_index(idx_spin))
+    assert np.array_equal(ovlp, [True, True, False, False])
+    assert np.array_equal(ovlp, _loop(start, idx_spin, step))
+    # No spindles :
+    empty = np.array([], dtype=int)
+    ovlp = _events_overlap(np.ceil(start - step), start + step, empty, empty)
+    assert not ovlp.any() and ovlp.shape == start.shape
+
+
+def test_write_edf():
+    """Test writing an EDF file and reading it back."""
+    import datetime
+    import tempfile
+    from visbrain.io import write_edf, load_sleepdataset
+    from visbrain.utils.sleep.edfsource import EdfSource
+    x = np.random.RandomState(0).randn(3, 1000) * [[10.], [100.], [1.]]
+    path = os.path.join(tempfile.mkdtemp(), 'test.edf')
+    write_edf(path, x, 100., ['Cz', 'Fz', 'EOG'],
+              start_time=datetime.time(22, 30, 15))
+    source = EdfSource(path)
+    assert list(source.channels) == ['Cz', 'Fz', 'EOG']
+    assert source.sfori == 100. and source.N == 1000
+    assert source.start_time == datetime.time(22, 30, 15)
+    # Values are quantized over the (slightly enlarged) range of the data :
+    step = 1.01 * (x.max(1) - x.min(1)) / 65535.
+    err = np.abs(source.read() - x).max(1)
+    assert np.all(err <= step / 2.)
+    # Same data using the registry of sleep readers :
+    sf, _, data, chan, npts, _ = load_sleepdataset(path)
+    assert sf == 100. and chan == ['Cz', 'Fz', 'EOG'] and npts == 1000
+    assert np.array_equal(data, source.read())
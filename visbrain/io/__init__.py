@@ -4,6 +4,7 @@ from .read_sleep import *
 from .write_table import *
 from .write_image import *
 from .write_data import *
+from .write_sleep import *
 from .mneio import *
 from .dialog import *
 from .rw_utils import *
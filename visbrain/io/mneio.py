@@ -1,4 +1,5 @@
 """Utility functions if MNE is installed."""
+import os
 
 __all__ = ['mne_is_installed', 'mne_read_sleep']
 
@@ -12,9 +13,12 @@ def mne_is_installed():
         return False
 
 
-def mne_read_sleep(file, ext, *args, **kwargs):
+def mne_read_sleep(file, ext, downsample=None, channels=None, **kwargs):
     """Read sleep datasets using mne.io.
 
+    The file is opened without preloading data (preload=False) and wrapped
+    into a recording source so that windows are read on demand.
+
     Args:
         file: string
             Filename.
@@ -22,21 +26,39 @@ def mne_read_sleep(file, ext, *args, **kwargs):
         ext: string
             File extension.
 
-        arg: tuple
-            Further arguments.
-
     Kargs:
-        kargs: dict, optional, (def: {})
-            Further optional arguments.
+        downsample: float, optional, (def: None)
+            The downsampling frequency.
+
+        channels: list, optional, (def: None)
+            List of channel names (or indices) to read.
+
+        kwargs: dict, optional, (def: {})
+            Further optional arguments passed to the mne.io reader.
+
+    Returns:
+        source: MneRawSource
+            The recording source.
     """
     from mne.io import (read_raw_egi, read_raw_cnt)
-    raise ValueError("ASSURER COMPATIBILITE MNE")
+    from ..utils.sleep import MneRawSource
 
     # Get full path :
     path = file + ext
 
     if ext == '.egi':  # EGI
-        return read_raw_egi(path, *args, **kwargs)
+        raw = read_raw_egi(path, preload=False, **kwargs)
+
+    elif ext == '.cnt':  # Neuroscan CNT
+        raw = read_raw_cnt(path, preload=False, **kwargs)
+
+    else:
+        raise ValueError("*" + ext + " files can not be read with MNE.")
+
+    return MneRawSource(raw, downsample, channels)
+
 
-    elif ext == '.cnt':  # EGI
-        return read_raw_cnt(path, *args, **kwargs)
+def _mne_reader(path, downsample=None, channels=None):
+    """Reader of the sleep reader registry for MNE formats."""
+    file, ext = os.path.splitext(path)
+    return mne_read_sleep(file, ext.lower(), downsample, channels)
@@ -1,83 +1,266 @@
 """Load sleep files.
 
+Sleep files are opened by readers found in a registry. Readers are
+registered by file extension, with an optional test on the file (magic bytes
+or probe function) and are only imported when a file of this format is
+opened for the first time. A reader is a class (or a function) called as
+reader(path, downsample, channels) which only parses the header of the file
+and returns an object exposing read_header() and read_window() (see
+visbrain.utils.RecordingSource). Use open_recording() to open a file as a
+source or load_sleepdataset() to load it (optionally through a cache).
+
 This file contain functions to load :
 - European Data Format (*.edf)
 - Micromed (*.trc)
 - BrainVision (*.eeg)
 - ELAN (*.eeg)
 - Hypnogram (*.hyp)
+- EGI (*.egi) and Neuroscan (*.cnt) using MNE (if installed)
 """
 import os
+from importlib import import_module
 
-from .rw_utils import get_file_ext
-from .mneio import mne_is_installed, mne_read_sleep
+__all__ = ['register_sleep_reader', 'get_sleep_reader', 'open_recording',
+           'load_sleepdataset', 'switch_sleep', 'read_edf', 'read_trc',
+           'read_eeg', 'read_elan', 'read_hyp']
 
-__all__ = ['switch_sleep', 'read_edf', 'read_trc', 'read_eeg', 'read_elan',
-           'read_hyp']
+# Registered readers (in the order of registration) :
+_READERS = []
 
 
-def switch_sleep(path, *args, **kwargs):
-    """Switch between sleep data files.
+def register_sleep_reader(name, extensions, reader, magic=None, probe=None):
+    """Register a sleep file reader.
+
+    Args:
+        name: string
+            Name of the format.
+
+        extensions: string | list
+            File extension(s) of the format (e.g '.edf').
+
+        reader: string | callable
+            The reader called as reader(path, downsample, channels). Use a
+            'module:attribute' string (e.g 'mypackage.io:MySource') to only
+            import the reader on first use.
+
+    Kargs:
+        magic: tuple, optional, (def: None)
+            Tuple (offset, bytes) of bytes the file must contain at a given
+            offset.
+
+        probe: callable, optional, (def: None)
+            Function called as probe(path) which returns True if the file can
+            be read by this reader (e.g when several formats share the same
+            extension).
+    """
+    if isinstance(extensions, str):
+        extensions = [extensions]
+    _READERS.append({'name': name, 'reader': reader, 'magic': magic,
+                     'probe': probe,
+                     'extensions': [k.lower() for k in extensions]})
+
+
+def _match(entry, path):
+    """Test if a registered reader can read a file."""
+    if entry['magic'] is not None:
+        offset, magic = entry['magic']
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            if f.read(len(magic)) != magic:
+                return False
+    return entry['probe'] is None or entry['probe'](path)
+
+
+def _load_reader(entry):
+    """Import (on first use) the reader of a registry entry."""
+    if isinstance(entry['reader'], str):
+        module, attr = entry['reader'].split(':')
+        entry['reader'] = getattr(import_module(module), attr)
+    return entry['reader']
+
+
+def _read_format(name, path, downsample=None, channels=None):
+    """Read a file using the registered reader of a format."""
+    entry = [k for k in _READERS if k['name'] == name][-1]
+    return _load_reader(entry)(path, downsample, channels)
+
+
+def get_sleep_reader(path):
+    """Get the reader of a sleep file.
 
     Args:
         path: string
             Full path to the filename.
 
-        arg: tuple
-            Further arguments.
+    Returns:
+        reader: callable
+            The reader (imported if needed).
+    """
+    file, ext = os.path.splitext(path)
+    entries = [k for k in _READERS if ext.lower() in k['extensions']]
+    if not entries:
+        raise ValueError("*" + ext + " files are currently not supported.")
+    for entry in entries:
+        if _match(entry, path):
+            return _load_reader(entry)
+    raise ValueError("No reader can open " + path + " (tried " + ", ".join(
+        [k['name'] for k in entries]) + ").")
+
+
+def open_recording(path, downsample=None, channels=None):
+    """Open a sleep dataset (elan, edf, brainvision, micromed) as a source.
+
+    The reader is found in the registry (see register_sleep_reader). Only
+    the header of the file is read.
+
+    Args:
+        path: string
+            Filename (with full path) to sleep dataset.
 
     Kargs:
-        kargs: dict, optional, (def: {})
-            Further optional arguments.
+        downsample: float, optional, (def: None)
+            Downsampling frequency.
+
+        channels: list, optional, (def: None)
+            List of channel names (or indices) to read. If None, all channels
+            are read.
+
+    Return:
+        source: RecordingSource
+            The recording source.
+    """
+    # Test if file exist :
+    assert os.path.isfile(path)
+
+    # Find the reader of this file in the registry :
+    return get_sleep_reader(path)(path, downsample, channels)
+
+
+def load_sleepdataset(path, downsample=None, channels=None, cache=None):
+    """Load a sleep dataset (elan, edf, brainvision).
+
+    Args:
+        path: string
+            Filename (with full path) to sleep dataset.
+
+    Kargs:
+        downsample: float (def 100.)
+            Downsampling frequency
+
+        channels: list, optional, (def: None)
+            List of channel names (or indices) to load. Only those channels
+            are read from the file. If None, all channels are loaded.
+
+        cache: bool | str | SleepCache, optional, (def: None)
+            Use an on-disk cache of decoded datasets. Use True for the
+            default cache directory, a string for a custom directory or a
+            SleepCache instance. On a cache hit, data are returned as a
+            read-only memory map. If None, the cache is not used.
+
+    Return:
+        sf: int
+            The sampling frequency.
+
+        data: np.ndarray
+            The data organised as well (n_channels, n_points)
+
+        chan: list
+            The list of channel's names.
+
+        N: int
+            Number of samples in the original data
+
+        start_time: time(hh:mm:ss)
+            Starting time of the recording
+
+        Example:
+            >> > import os
+            >> >  # Define path where the file is located
+            >> > pathfile = 'mypath/'
+            >> > path = os.path.join(pathfile, 'myfile.*')
+            >> > sf, data, chan, N, start_time = load_sleepdataset(path, 100.)
     """
-    # Find file extension :
-    file, ext = get_file_ext(path)
+    from ..utils.sleep.cache import SleepCache
+    from ..utils.sleep.fileconvert import _source2array
 
-    if ext == '.eeg':  # BrainVision // ELAN
-        if os.path.isfile(file + '.ent'):  # ELAN
-            return read_elan(path, *args, **kwargs)
+    if cache in [None, False]:
+        return _source2array(open_recording(path, downsample, channels))
+    if not isinstance(cache, SleepCache):
+        cache = SleepCache(None if cache is True else cache)
+    entry = cache.get(path, downsample, channels)
+    if entry is None:
+        source = open_recording(path, downsample, channels)
+        entry = cache.set(path, source, downsample, channels)
+    return entry
 
-        elif os.path.isfile(file + '.vhdr'):  # BrainVision
-            return read_eeg(path, *args, **kwargs)
 
-        else:  # None :
-            raise ValueError("No header file found in this directory. You "
-                             "should have a *.ent (ELAN) or *.vhdr "
-                             "(BrainVision)")
+def _is_elan(path):
+    """Test if an .eeg file has an ELAN header."""
+    return os.path.isfile(path + '.ent')
 
-    elif ext == '.edf':  # European Data Format
-        return read_edf(path, *args, **kwargs)
 
-    elif ext == '.trc':  # Micromed
-        return read_trc(path, *args, **kwargs)
+def _is_brainvision(path):
+    """Test if an .eeg file has a BrainVision header."""
+    return os.path.isfile(os.path.splitext(path)[0] + '.vhdr')
 
-    elif mne_is_installed() and (ext in ['.egi', '.cnt']):  # Present in MNE
-        return mne_read_sleep(file, ext, *args, **kwargs)
 
-    else:  # None
-        raise ValueError("*" + ext + " files are currently not supported.")
+# Each format is read by a source defined in its own module :
+_SOURCES = 'visbrain.utils.sleep.'
+register_sleep_reader('ELAN', '.eeg', _SOURCES + 'elansource:ElanSource',
+                      probe=_is_elan)
+register_sleep_reader('BrainVision', '.eeg',
+                      _SOURCES + 'brainvisionsource:BrainVisionSource',
+                      probe=_is_brainvision)
+register_sleep_reader('EDF', '.edf', _SOURCES + 'edfsource:EdfSource',
+                      magic=(0, b'0       '))
+register_sleep_reader('Micromed', '.trc',
+                      _SOURCES + 'micromedsource:MicromedSource',
+                      magic=(175, b'\x04'))
+# Formats read through MNE (only imported if a file is opened) :
+register_sleep_reader('MNE', ['.egi', '.cnt'], 'visbrain.io.mneio:_mne_reader')
+
+
+def switch_sleep(path, *args, **kwargs):
+    """Switch between sleep data files.
+
+    Args:
+        path: string
+            Full path to the filename.
+
+        arg: tuple
+            Further arguments.
+
+    Kargs:
+        kargs: dict, optional, (def: {})
+            Further optional arguments.
+    """
+    # Test if file exist :
+    assert os.path.isfile(path)
+
+    return get_sleep_reader(path)(path, *args, **kwargs)
 
 
-def read_edf():
+def read_edf(path, downsample=None, channels=None):
     """Read data from a European Data Format (edf) file."""
-    pass
+    return _read_format('EDF', path, downsample, channels)
 
 
-def read_trc():
+def read_trc(path, downsample=None, channels=None):
     """Read data from a Micromed (trc) file."""
-    pass
+    return _read_format('Micromed', path, downsample, channels)
 
 
-def read_eeg():
+def read_eeg(path, downsample=None, channels=None):
     """Read data from a BrainVision (eeg) file."""
-    pass
+    return _read_format('BrainVision', path, downsample, channels)
 
 
-def read_elan():
+def read_elan(path, downsample=None, channels=None):
     """Read data from a ELAN (eeg) file."""
-    pass
+    return _read_format('ELAN', path, downsample, channels)
 
 
-def read_hyp():
+def read_hyp(path, npts=None):
     """Read data from a hypnogram (hyp) file."""
-    pass
+    from .rw_hypno import load_hypno_hyp
+    return load_hypno_hyp(path, npts)
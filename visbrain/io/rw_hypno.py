@@ -3,15 +3,21 @@
 - write_hypno_txt : as text file
 - write_hypno_hyp : as hyp file
 - read_hypno : read either *.hyp or *.txt hypnogram data
+- read_hypnos : read a list of hypnogram files concurrently
 - load_hypno_hyp : load *.hyp hypnogram data
 - load_hypno_txt : load *.txt hypnogram data
 """
 import numpy as np
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 from warnings import warn
 
 __all__ = ['write_hypno_txt', 'write_hypno_hyp', 'read_hypno',
-           'load_hypno_hyp', 'load_hypno_txt']
+           'read_hypnos', 'load_hypno_hyp', 'load_hypno_txt']
+
+# Lines of hypnogram files that contain a stage :
+_STAGE_LINE = re.compile(r'^[ \t]*(-?\d+)[ \t\r]*$', re.MULTILINE)
 
 
 def write_hypno_txt(filename, hypno, sf, sfori, N, window=1.):
@@ -23,8 +29,8 @@ def write_hypno_txt(filename, hypno, sf, sfori, N, window=1.):
         filename: str
             Filename (with full path) of the file to save
 
-        hypno: np.ndarray
-            Hypnogram array, same length as data
+        hypno: np.ndarray | Hypnogram
+            Hypnogram array (same length as data) or compact hypnogram.
 
         sf: float
             Sampling frequency of the data (after downsampling)
@@ -47,8 +53,7 @@ def write_hypno_txt(filename, hypno, sf, sfori, N, window=1.):
                                               base)[0] + '_description.txt')
 
     # Save hypno
-    step = int(hypno.shape / np.round(N / sfori))
-    np.savetxt(filename, hypno[::step].astype(int), fmt='%s')
+    np.savetxt(filename, _hypno_seconds(hypno, sfori, N), fmt='%s')
 
     # Save header file
     hdr = np.array([['time ' + str(window)], ['W 0'], ['N1 1'], ['N2 2'],
@@ -63,8 +68,8 @@ def write_hypno_hyp(filename, hypno, sf, sfori, N):
         filename: str
             Filename (with full path) of the file to save
 
-        hypno: np.ndarray
-            Hypnogram array, same length as data
+        hypno: np.ndarray | Hypnogram
+            Hypnogram array (same length as data) or compact hypnogram.
 
         sf: int
             Sampling frequency of the data (after downsampling)
@@ -77,9 +82,8 @@ def write_hypno_hyp(filename, hypno, sf, sfori, N):
     """
     # Check data format
     sf = int(sf)
-    hypno = hypno.astype(int)
+    hypno = _hypno_seconds(hypno, sfori, N)
     hypno[hypno == 4] = 5
-    step = int(hypno.shape / np.round(N / sfori))
 
     hdr = np.array([['time_base 1.000000'],
                     ['sampling_period ' + str(np.round(1/sfori, 8))],
@@ -87,11 +91,33 @@ def write_hypno_hyp(filename, hypno, sf, sfori, N):
                     ['epoch_list']]).flatten()
 
     # Save
-    export = np.append(hdr, hypno[::step].astype(str))
+    export = np.append(hdr, hypno.astype(str))
     np.savetxt(filename, export, fmt='%s')
 
 
-def read_hypno(path, npts):
+def _hypno_seconds(hypno, sfori, N):
+    """Get one (int) hypnogram value per second."""
+    from ..utils.sleep import Hypnogram
+    if isinstance(hypno, Hypnogram):
+        return hypno.to_epochs(1.).astype(int)
+    step = int(hypno.shape[0] / np.round(N / sfori))
+    return hypno[::step].astype(int)
+
+
+def _hypno_samples(stages, npts):
+    """Repeat hypnogram stages to get npts samples.
+
+    Each stage is repeated floor(npts / n_stages) times and the last stage
+    is used to complete the vector.
+    """
+    from ..utils.sleep import Hypnogram
+    rep = int(np.floor(npts / len(stages)))
+    if rep == 0:
+        raise ValueError("The hypnogram has more stages than data points.")
+    return Hypnogram(stages, epoch=rep).to_samples(1., npts, dtype=int)
+
+
+def read_hypno(path, npts=None):
     """Load hypnogram file.
 
     Sleep stages in the hypnogram should be scored as follow
@@ -108,12 +134,15 @@ def read_hypno(path, npts):
         path: string
             Filename (with full path) to hypnogram file.
 
-        npts: int
-            Data length.
+    Kargs:
+        npts: int, optional, (def: None)
+            Data length. If None, the compact hypnogram is returned instead
+            of a vector.
 
     Return:
-        hypno: np.ndarray
-            The hypnogram vector with same length as downsampled data.
+        hypno: np.ndarray | Hypnogram
+            The hypnogram vector with same length as downsampled data or the
+            compact hypnogram if npts is None.
     """
     # Test if file exist :
     assert os.path.isfile(path)
@@ -132,15 +161,6 @@ def read_hypno(path, npts):
             elif ext in ['.txt', '.csv']:
                 hypno = load_hypno_txt(path, npts)
 
-            # Complete hypnogram if needed :
-            n = len(hypno)
-            if n < npts:
-                hypno = np.append(hypno, hypno[-1]*np.ones((npts-n,)))
-            elif n > npts:
-                raise ValueError("The length of the hypnogram \
-                                 vector must be" + str(npts) +
-                                 " (Currently : " + str(n) + ".")
-
             return hypno
 
     except:
@@ -149,59 +169,83 @@ def read_hypno(path, npts):
         return None
 
 
-def load_hypno_hyp(path, npts):
+def read_hypnos(paths, npts=None, max_workers=None):
+    """Load a list of hypnogram files concurrently.
+
+    Files are parsed by a pool of threads using read_hypno.
+
+    Args:
+        paths: list
+            List of filenames (with full path) to hypnogram files.
+
+    Kargs:
+        npts: int | list, optional, (def: None)
+            Data length (either one for all files or one per file). If None,
+            compact hypnograms are returned.
+
+        max_workers: int, optional, (def: None)
+            Maximum number of threads.
+
+    Return:
+        hypnos: list
+            List of hypnograms (see read_hypno). Hypnograms that can not be
+            parsed are None.
+    """
+    if not isinstance(npts, (list, tuple, np.ndarray)):
+        npts = [npts] * len(paths)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(read_hypno, paths, npts))
+
+
+def load_hypno_hyp(path, npts=None):
     """Read Elan hypnogram (hyp).
 
     Args:
         path: str
             Filename(with full path) to Elan .hyp file
 
-        npts: int
-            Data length.
+    Kargs:
+        npts: int, optional, (def: None)
+            Data length. If None, the compact hypnogram (one stage per
+            second) is returned instead of a vector.
 
     Return:
-        hypno: np.ndarray
-            The hypnogram vector with same length as downsampled data.
+        hypno: np.ndarray | Hypnogram
+            The hypnogram vector with same length as downsampled data or the
+            compact hypnogram if npts is None.
 
     """
-    hyp = np.genfromtxt(path, delimiter='\n', usecols=[0],
-                        dtype=None, skip_header=0)
-
-    hyp = np.char.decode(hyp)
-
-    # Sampling rate of original .eeg file
-    # sf = 1 / float(hyp[1].split()[1])
-
-    # Extract hypnogram values
-    hypno = np.array(hyp[4:], dtype=np.int)
+    # Extract hypnogram values (after the 4 header lines) :
+    hypno = _read_stages(path, skip=4)
 
     # Replace values according to Iber et al 2007
-    hypno[hypno == -2] = -1
-    hypno[hypno == 4] = 3
-    hypno[hypno == 5] = 4
+    hypno = _remap(hypno, {-2: -1, 4: 3, 5: 4})
 
-    # Get the repetition number :
-    rep = int(np.floor(npts/len(hypno)))
+    if npts is None:
+        from ..utils.sleep import Hypnogram
+        return Hypnogram(hypno, epoch=1.)
 
     # Resample to get same number of points as in eeg file
-    hypno = np.repeat(hypno, rep)
+    return _hypno_samples(hypno, npts)
 
-    return hypno
 
-
-def load_hypno_txt(path, npts):
+def load_hypno_txt(path, npts=None):
     """Read text files (.txt / .csv) hypnogram.
 
     Args:
         path: str
             Filename(with full path) to hypnogram(.txt)
 
-        npts: int
-            Data length.
+    Kargs:
+        npts: int, optional, (def: None)
+            Data length. If None, the compact hypnogram is returned instead
+            of a vector (the epoch length is read from the 'time' entry of
+            the description file).
 
     Return:
-        hypno: np.ndarray
-            The hypnogram vector with same length as downsampled data.
+        hypno: np.ndarray | Hypnogram
+            The hypnogram vector with same length as downsampled data or the
+            compact hypnogram if npts is None.
 
     """
     assert os.path.isfile(path)
@@ -212,30 +256,17 @@ def load_hypno_txt(path, npts):
     assert os.path.isfile(header)
 
     # Load header file
-    labels = np.genfromtxt(header, dtype=str, delimiter=" ", usecols=0)
-    values = np.genfromtxt(header, dtype=int, delimiter=" ", usecols=1)
-    desc = {label: row for label, row in zip(labels, values)}
+    desc = _read_description(header)
 
     # Load hypnogram file
-    hyp = np.genfromtxt(path, delimiter='\n', usecols=[0],
-                        dtype=None, skip_header=0)
-
-    if not np.issubdtype(hyp.dtype, np.integer):
-        hyp = np.char.decode(hyp)
-        hypno = np.array([s for s in hyp if s.lstrip('-').isdigit()],
-                         dtype=int)
-    else:
-        hypno = hyp.astype(int)
+    hypno = swap_hyp_values(_read_stages(path), desc)
 
-    hypno = swap_hyp_values(hypno, desc)
-
-    # Get the repetition number :
-    rep = int(np.floor(npts/len(hypno)))
+    if npts is None:
+        from ..utils.sleep import Hypnogram
+        return Hypnogram(hypno, epoch=desc.get('time', 1.))
 
     # Resample to get same number of points as in eeg file
-    hypno = np.repeat(hypno, rep)
-
-    return hypno
+    return _hypno_samples(hypno, npts)
 
 
 def swap_hyp_values(hypno, desc):
@@ -264,34 +295,60 @@ def swap_hyp_values(hypno, desc):
         N3      1           3
         REM     0           4
     """
-    # Swap values
-    hypno_s = -1 * np.ones(shape=(hypno.shape), dtype=int)
+    # Stages are swapped in that order (e.g N4 overrides N3) :
+    order = [('Art', -1), ('Nde', -1), ('Mt', -1), ('W', 0), ('N1', 1),
+             ('N2', 2), ('N3', 3), ('N4', 3), ('REM', 4)]
+    mapping = {int(desc[k]): v for k, v in order if k in desc}
+    return _remap(np.asarray(hypno, dtype=int), mapping, default=-1)
 
-    if 'Art' in desc:
-        hypno_s[hypno == desc['Art']] = -1
 
-    if 'Nde' in desc:
-        hypno_s[hypno == desc['Nde']] = -1
+def _read_stages(path, skip=0):
+    """Read integer stages of a hypnogram file in a single pass.
 
-    if 'Mt' in desc:
-        hypno_s[hypno == desc['Mt']] = -1
+    Only lines containing a single integer are kept (after the skip first
+    lines).
+    """
+    with open(path, 'r') as f:
+        text = f.read()
+    if skip:
+        text = text.split('\n', skip)[-1] if text.count('\n') >= skip else ''
+    return np.array(_STAGE_LINE.findall(text), dtype=int)
 
-    if 'W' in desc:
-        hypno_s[hypno == desc['W']] = 0
 
-    if 'N1' in desc:
-        hypno_s[hypno == desc['N1']] = 1
+def _read_description(path):
+    """Read the (label, value) description file of a txt hypnogram."""
+    with open(path, 'r') as f:
+        lines = [k.split() for k in f.read().splitlines()]
+    return {k[0]: float(k[1]) for k in lines if len(k) >= 2}
 
-    if 'N2' in desc:
-        hypno_s[hypno == desc['N2']] = 2
 
-    if 'N3' in desc:
-        hypno_s[hypno == desc['N3']] = 3
+def _remap(hypno, mapping, default=None):
+    """Remap stage codes with a lookup table.
+
+    Args:
+        hypno: np.ndarray
+            Integer hypnogram.
 
-    if 'N4' in desc:
-        hypno_s[hypno == desc['N4']] = 3
+        mapping: dict
+            Dictionary of {code: new_value}.
 
-    if 'REM' in desc:
-        hypno_s[hypno == desc['REM']] = 4
+    Kargs:
+        default: int, optional, (def: None)
+            Value of the codes that are not in mapping. If None, those codes
+            are kept.
 
-    return hypno_s
\ No newline at end of file
+    Returns:
+        hypno: np.ndarray
+            The remapped hypnogram.
+    """
+    if not hypno.size:
+        return hypno.copy()
+    lo = min([hypno.min()] + list(mapping))
+    hi = max([hypno.max()] + list(mapping))
+    if default is None:
+        lut = np.arange(lo, hi + 1)
+    else:
+        lut = np.full((hi - lo + 1,), default, dtype=int)
+    for code, value in mapping.items():
+        lut[code - lo] = value
+    return lut[hypno - lo]
@@ -0,0 +1,188 @@
+"""Write sleep data.
+
+- write_edf : Write data as an EDF / EDF+ (edf) file
+"""
+import datetime
+
+import numpy as np
+
+__all__ = ['write_edf']
+
+
+def _edf_field(value, size):
+    """Format a value as a left-justified ascii EDF header field."""
+    value = str(value)
+    if len(value) > size:
+        raise ValueError("EDF header value " + value + " is longer than " +
+                         str(size) + " characters.")
+    return value.ljust(size).encode('ascii')
+
+
+def _edf_number(value, size=8):
+    """Format a number so that it fits in an EDF header field."""
+    for prec in range(size, 0, -1):
+        txt = '%.*g' % (prec, value)
+        if len(txt) <= size:
+            return _edf_field(txt, size)
+    raise ValueError("Can not write " + str(value) + " in an EDF header.")
+
+
+def _physical_range(data, block):
+    """Get the (min, max) of each channel, reading data block by block."""
+    if hasattr(data, 'stats'):
+        info = data.stats()
+        return info['min'].astype(float), info['max'].astype(float)
+    pmin = np.full((data.shape[0],), np.inf)
+    pmax = np.full((data.shape[0],), -np.inf)
+    for k in range(0, data.shape[1], block):
+        x = np.asarray(data[:, k:k + block])
+        np.minimum(pmin, x.min(1), out=pmin)
+        np.maximum(pmax, x.max(1), out=pmax)
+    return pmin, pmax
+
+
+def write_edf(filename, data, sf, channels, start_time=None, units='uV',
+              physical_range=None, record_duration=1., edfplus=False,
+              block_duration=60., subject_id='X', recording_id='X'):
+    """Write data as an EDF / EDF+ (edf) file.
+
+    Data are streamed to the file by blocks of records and quantized to
+    int16 using the physical range of each channel, so that the memory used
+    is bounded by the size of a block.
+
+    Args:
+        filename: string
+            Filename (with full path) of the EDF file.
+
+        data: np.ndarray | RecordingSource
+            Data of shape (n_channels, n_points). A recording source (e.g.
+            the re-referenced data of Sleep) is only read block by block.
+
+        sf: float
+            The sampling frequency.
+
+        channels: list
+            List of channel names.
+
+    Kargs:
+        start_time: datetime.datetime | datetime.time, optional, (def: None)
+            Starting date and time of the recording.
+
+        units: string | list, optional, (def: 'uV')
+            Physical unit of each channel.
+
+        physical_range: np.ndarray, optional, (def: None)
+            Physical (min, max) of each channel of shape (n_channels, 2). If
+            None, the range of the data is used (which requires to read data
+            once before writing).
+
+        record_duration: float, optional, (def: 1.)
+            Duration of a data record (in seconds). sf * record_duration must
+            be an integer.
+
+        edfplus: bool, optional, (def: False)
+            Write an EDF+ file (with a time-keeping annotation channel).
+
+        block_duration: float, optional, (def: 60.)
+            Duration of the blocks of records written at once (in seconds).
+
+        subject_id: string, optional, (def: 'X')
+            Subject identification.
+
+        recording_id: string, optional, (def: 'X')
+            Recording identification.
+    """
+    nchan, npts = data.shape
+    if len(channels) != nchan:
+        raise ValueError("The number of channel names must be " + str(nchan))
+    n_sam = sf * record_duration
+    if abs(n_sam - round(n_sam)) > 1e-6:
+        raise ValueError("The number of samples per record (sf * "
+                         "record_duration) must be an integer.")
+    n_sam = int(round(n_sam))
+    n_rec = int(np.ceil(npts / n_sam))
+    rec_block = max(int(block_duration / record_duration), 1)
+    units = [units] * nchan if isinstance(units, str) else list(units)
+
+    # ---------------- Quantization ----------------
+    if physical_range is None:
+        pmin, pmax = _physical_range(data, rec_block * n_sam)
+    else:
+        physical_range = np.asarray(physical_range, dtype=float)
+        pmin, pmax = physical_range[:, 0], physical_range[:, 1]
+    # Avoid null ranges (e.g flat channels) :
+    flat = pmax <= pmin
+    pmin, pmax = np.where(flat, pmin - 1., pmin), np.where(flat, pmax + 1.,
+                                                           pmax)
+    # Keep header values and quantization consistent (the range is slightly
+    # enlarged so that rounding header values never clips data) :
+    margin = 1e-4 * (pmax - pmin)
+    pmin, pmax = pmin - margin, pmax + margin
+    pmin = np.array([float(_edf_number(k)) for k in pmin])
+    pmax = np.array([float(_edf_number(k)) for k in pmax])
+    dmin, dmax = -32768, 32767
+    gain = (dmax - dmin) / (pmax - pmin)
+
+    # ---------------- Annotations (EDF+) ----------------
+    n_annot = 30 if edfplus else 0
+    labels = list(channels) + (['EDF Annotations'] if edfplus else [])
+    nsig = len(labels)
+
+    # ---------------- Header ----------------
+    if start_time is None:
+        start_time = datetime.datetime(1985, 1, 1)
+    elif isinstance(start_time, datetime.time):
+        start_time = datetime.datetime.combine(datetime.date(1985, 1, 1),
+                                               start_time)
+    if edfplus:
+        recording_id = 'Startdate ' + start_time.strftime(
+            '%d-%b-%Y').upper() + ' ' + recording_id
+    hdr = _edf_field('0', 8) + _edf_field(subject_id, 80)
+    hdr += _edf_field(recording_id, 80)
+    hdr += _edf_field(start_time.strftime('%d.%m.%y'), 8)
+    hdr += _edf_field(start_time.strftime('%H.%M.%S'), 8)
+    hdr += _edf_field(256 * (nsig + 1), 8)
+    hdr += _edf_field('EDF+C' if edfplus else '', 44)
+    hdr += _edf_field(n_rec, 8) + _edf_number(record_duration)
+    hdr += _edf_field(nsig, 4)
+    fields = [(labels, 16), (['' for k in labels], 80),
+              (units + [''] * edfplus, 8)]
+    for values, size in fields:
+        hdr += b''.join([_edf_field(k, size) for k in values])
+    hdr += b''.join([_edf_number(k) for k in pmin] + [_edf_number(-1.)] *
+                    edfplus)
+    hdr += b''.join([_edf_number(k) for k in pmax] + [_edf_number(1.)] *
+                    edfplus)
+    hdr += b''.join([_edf_field(dmin, 8)] * nsig)
+    hdr += b''.join([_edf_field(dmax, 8)] * nsig)
+    hdr += b''.join([_edf_field('', 80)] * nsig)
+    hdr += b''.join([_edf_field(n_sam, 8)] * nchan + [_edf_field(
+        n_annot, 8)] * edfplus)
+    hdr += b''.join([_edf_field('', 32)] * nsig)
+
+    # ---------------- Data records ----------------
+    with open(filename, 'wb') as f:
+        f.write(hdr)
+        for r in range(0, n_rec, rec_block):
+            nr = min(rec_block, n_rec - r)
+            x = np.array(data[:, r * n_sam:(r + nr) * n_sam],
+                         dtype=np.float64)
+            # Pad the last record with the last value :
+            if x.shape[1] < nr * n_sam:
+                x = np.pad(x, ((0, 0), (0, nr * n_sam - x.shape[1])), 'edge')
+            # Quantize to int16 :
+            x -= pmin[:, np.newaxis]
+            x *= gain[:, np.newaxis]
+            x += dmin
+            np.clip(np.round(x, out=x), dmin, dmax, out=x)
+            # (n_chan, n_rec * n_sam) -> (n_rec, n_chan * n_sam) :
+            block = np.empty((nr, nchan * n_sam + n_annot), dtype='<i2')
+            block[:, :nchan * n_sam] = x.reshape(nchan, nr, n_sam).transpose(
+                1, 0, 2).reshape(nr, -1)
+            if edfplus:
+                # Time-keeping annotation of each record :
+                for k in range(nr):
+                    tal = ('+%g\x14\x14\x00' % ((r + k) * record_duration))
+                    tal = tal.encode('ascii').ljust(2 * n_annot, b'\x00')
+                    block[k, nchan * n_sam:] = np.frombuffer(tal, dtype='<i2')
+            f.write(block.tobytes())
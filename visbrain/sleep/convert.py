@@ -0,0 +1,149 @@
+"""Batch conversion of sleep recordings into the Sleep cache.
+
+Decode every recording of a directory (any format of the sleep reader
+registry, e.g ELAN, BrainVision, EDF and Micromed) and store the down-sampled
+data and their envelope pyramid into the cache used by Sleep(..., cache=...),
+so that recordings open instantly in the interface. Files are converted in
+parallel by a pool of processes.
+
+Usage :
+
+    python -m visbrain.sleep.convert DIR [--cache CACHE_DIR] [--workers N]
+                                         [--downsample DS] [--max-size GB]
+"""
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from ..io import get_sleep_reader, load_sleepdataset
+from ..utils.sleep import SleepCache, EnvelopePyramid
+
+__all__ = ['find_recordings', 'convert_directory']
+
+
+def find_recordings(directory):
+    """Find all sleep recordings of a directory (and sub-directories).
+
+    Args:
+        directory: str
+            Path to the directory.
+
+    Returns:
+        files: list
+            Sorted list of recording filenames.
+    """
+    files = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            # Keep files that a registered reader can open :
+            try:
+                get_sleep_reader(path)
+            except ValueError:
+                continue
+            files.append(path)
+    return sorted(files)
+
+
+def _convert_file(path, directory, downsample, max_size):
+    """Decode one recording into the cache (run in a worker process).
+
+    Returns:
+        size: int
+            Size of the recording (in bytes).
+
+        duration: float
+            Conversion time (in seconds).
+    """
+    t_start = time.time()
+    cache = SleepCache(directory, max_size)
+    data = load_sleepdataset(path, downsample, cache=cache)[2]
+    if cache.get_pyramid(path, downsample) is None:
+        cache.set_pyramid(path, EnvelopePyramid(data), downsample)
+    return os.path.getsize(path), time.time() - t_start
+
+
+def convert_directory(directory, cache=None, downsample=100., workers=None,
+                      max_size=None, report=sys.stdout):
+    """Decode all recordings of a directory into the Sleep cache.
+
+    Args:
+        directory: str
+            Path to the directory containing recordings.
+
+    Kargs:
+        cache: str, optional, (def: None)
+            Cache directory. By default, the default cache directory of
+            SleepCache is used.
+
+        downsample: float, optional, (def: 100.)
+            The downsampling frequency (use the one given to Sleep).
+
+        workers: int, optional, (def: None)
+            Maximum number of worker processes. By default, the number of
+            CPUs is used.
+
+        max_size: int, optional, (def: None)
+            Maximum size of the cache (in bytes). By default, the default
+            size of SleepCache is used.
+
+        report: file, optional, (def: sys.stdout)
+            Where to report the throughput of each file and failures.
+
+    Returns:
+        failed: dict
+            Dictionary of failed files and the corresponding error.
+    """
+    files = find_recordings(directory)
+    if max_size is None:
+        max_size = SleepCache(cache).max_size
+    workers = max(1, min(workers or os.cpu_count() or 1, len(files) or 1))
+    failed = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        jobs = {executor.submit(_convert_file, k, cache, downsample,
+                                max_size): k for k in files}
+        for job in as_completed(jobs):
+            path = jobs[job]
+            try:
+                size, duration = job.result()
+            except Exception as err:
+                failed[path] = err
+                report.write("FAILED %s : %r\n" % (path, err))
+                continue
+            mb = size / 1024. ** 2
+            report.write("%s : %.1f MB in %.2f s (%.1f MB/s)\n" % (
+                path, mb, duration, mb / max(duration, 1e-6)))
+    report.write("%i file(s) converted, %i failure(s)\n" % (
+        len(files) - len(failed), len(failed)))
+    return failed
+
+
+def main(argv=None):
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(
+        prog='python -m visbrain.sleep.convert',
+        description="Decode sleep recordings of a directory into the Sleep "
+                    "cache.")
+    parser.add_argument('directory', help="Directory of recordings.")
+    parser.add_argument('--cache', default=None,
+                        help="Cache directory (default: ~/.visbrain/"
+                             "sleep_cache).")
+    parser.add_argument('--downsample', type=float, default=100.,
+                        help="Downsampling frequency (default: 100).")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Maximum number of worker processes (default: "
+                             "number of CPUs).")
+    parser.add_argument('--max-size', type=float, default=None,
+                        help="Maximum size of the cache in GB.")
+    args = parser.parse_args(argv)
+    max_size = None if args.max_size is None else int(args.max_size *
+                                                      1024 ** 3)
+    failed = convert_directory(args.directory, args.cache, args.downsample,
+                               args.workers, max_size)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,7 +4,8 @@ from warnings import warn
 from PyQt5 import QtWidgets, QtCore
 
 from ....utils import (remdetect, spindlesdetect, slowwavedetect, kcdetect,
-                       peakdetect, mtdetect)
+                       peakdetect, mtdetect, DetectionContext,
+                       FeatureMemory)
 from ....utils.sleep.event import _event_to_index
 
 __all__ = ['uiDetection']
@@ -29,6 +30,10 @@ class uiDetection(object):
         self._ToolRdAll.clicked.connect(self._fcn_applyMethod)
         self._ToolDetectProgress.hide()
         self._fcn_switchDetection()
+        # Features shared by successive detections of each channel (all
+        # channels share the same memory budget) :
+        self._detectCtx = {}
+        self._detectMemory = FeatureMemory()
 
         # -------------------------------------------------
         # Location table :
@@ -95,6 +100,16 @@ class uiDetection(object):
         # Get channels to apply detection and the detection method :
         idx = self._fcn_getChanDetection()
         method = str(self._ToolDetectType.currentText())
+        # Detectors work on entire channels, which are therefore entirely
+        # read from the recording (once per channel, see the context).
+        # Only keep the detection contexts of these channels :
+        for k in set(self._detectCtx) - set(idx):
+            self._detectCtx.pop(k).close()
+        for k in idx:
+            if k not in self._detectCtx:
+                self._detectCtx[k] = DetectionContext(
+                    self._data[k, :], self._sf, self._hypno,
+                    memory=self._detectMemory)
 
         ############################################################
         # RUN DETECTION
@@ -111,7 +126,7 @@ class uiDetection(object):
                 thr = self._ToolRemTh.value()
                 rem_only = self._ToolRemOnly.isChecked()
                 # Get REM indices :
-                index, nb, dty, dur = remdetect(self._data[k, :], self._sf,
+                index, nb, dty, dur = remdetect(self._detectCtx[k], self._sf,
                                                 self._hypno, rem_only, thr)
 
             # ====================== SPINDLES ======================
@@ -125,15 +140,15 @@ class uiDetection(object):
                 nrem_only = self._ToolSpinRemOnly.isChecked()
                 # Get Spindles indices :
                 index, nb, dty, dur = spindlesdetect(
-                    self._data[k, :], self._sf, thr, self._hypno, nrem_only,
-                    fMin, fMax, tMin, tMax)
+                    self._detectCtx[k], self._sf, thr, self._hypno,
+                    nrem_only, fMin, fMax, tMin, tMax)
 
             # ====================== SLOW WAVES ======================
             elif method == 'Slow waves':
                 # Get variables :
                 thr = self._ToolWaveTh.value()
                 # Get Slow Waves indices :
-                index, nb, dty, dur = slowwavedetect(self._data[k, :],
+                index, nb, dty, dur = slowwavedetect(self._detectCtx[k],
                                                      self._sf, thr)
 
             # ====================== K-COMPLEXES ======================
@@ -147,7 +162,7 @@ class uiDetection(object):
                 max_amp = self._ToolKCMaxAmp.value()
                 nrem_only = self._ToolKCNremOnly.isChecked()
                 # Get Slow Waves indices :
-                index, nb, dty, dur = kcdetect(self._data[k, :], self._sf,
+                index, nb, dty, dur = kcdetect(self._detectCtx[k], self._sf,
                                                proba_thr, amp_thr, self._hypno,
                                                nrem_only, tmin, tmax, min_amp,
                                                max_amp)
@@ -158,7 +173,8 @@ class uiDetection(object):
                 look = int(self._ToolPeakLook.value() * self._sf)
                 disp = self._ToolPeakMinMax.currentIndex()
                 disp_types = ['max', 'min', 'minmax']
-                index, nb, dty = peakdetect(self._sf, self._data[k, :],
+                index, nb, dty = peakdetect(self._sf,
+                                            self._detectCtx[k].data(),
                                             self._time, lookahead=look,
                                             delta=1., threshold='auto',
                                             get=disp_types[disp])
@@ -168,8 +184,8 @@ class uiDetection(object):
                 # Get variables :
                 th = self._ToolMTTh.value()
                 rem_only = self._ToolMTOnly.isChecked()
-                index, nb, dty, dur = mtdetect(self._data[k, :], self._sf, th,
-                                               self._hypno, rem_only)
+                index, nb, dty, dur = mtdetect(self._detectCtx[k], self._sf,
+                                               th, self._hypno, rem_only)
 
             if index.size:
                 # Enable detection tab :
@@ -358,7 +374,8 @@ class uiDetection(object):
             # Go to :
             self._SlGoto.setValue(sta)
             # Set vertical lines to the location :
-            self._chan.set_location(self._sf, self._data[ix, :], ix, sta, end)
+            lim = np.r_[self._datainfo['min'][ix], self._datainfo['max'][ix]]
+            self._chan.set_location(self._sf, lim, ix, sta, end)
 
     def _fcn_editDetection(self):
         """Executed function when the item is edited."""
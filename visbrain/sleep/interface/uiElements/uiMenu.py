@@ -8,6 +8,7 @@ from PyQt5 import QtWidgets
 from ....io import (dialogSave, dialogLoad, write_fig_hyp, write_csv,
                     write_txt, write_hypno_txt, write_hypno_hyp, read_hypno,
                     write_fig_pyqt)
+from ....utils import EventTable
 
 __all__ = ['uiMenu']
 
@@ -163,10 +164,10 @@ class uiMenu(object):
         """Export all detections."""
         # Get file name :
         path = dialogSave(self, 'Save all detections', 'detections',
-                          "NumPy (*.npy);;All files (*.*)")
+                          "NumPy (*.npz);;All files (*.*)")
         if path:
             file = os.path.splitext(str(path))[0]
-            np.save(file + '.npy', self._detect.dict)
+            self._detect.to_table(self._sf, self._hypno).save(file + '.npz')
 
     def saveSelectDetect(self):
         """Export selected detection."""
@@ -369,8 +370,8 @@ class uiMenu(object):
         """Load all detections."""
         # Dialog window for detection file :
         file = dialogLoad(self, "Import detections", '',
-                          "NumPy (*.npy);;All files (*.*)")
-        self._detect.dict = np.ndarray.tolist(np.load(file))
+                          "NumPy (*.npz);;All files (*.*)")
+        self._detect.from_table(EventTable.load(file))
         # Made canvas visbles :
         for k in self._detect:
             if self._detect[k]['index'].size:
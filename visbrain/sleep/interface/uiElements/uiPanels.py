@@ -417,9 +417,9 @@ class uiPanels(object):
             cmap += '_r'
         self._specLabel.setText(self._addspace + self._channels[chan])
         # Set data :
-        self._spec.set_data(self._sf, self._data[chan, ...], self._time,
-                            nfft=nfft, overlap=over, fstart=fstart, fend=fend,
-                            cmap=cmap, contraste=contraste)
+        self._spec.set_data(self._sf, self._data, self._time, nfft=nfft,
+                            overlap=over, fstart=fstart, fend=fend, cmap=cmap,
+                            contraste=contraste, chan=chan)
         # Set apply button disable :
         self._PanSpecApply.setEnabled(False)
 
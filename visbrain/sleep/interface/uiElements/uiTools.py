@@ -3,7 +3,7 @@
 import numpy as np
 from PyQt5 import QtWidgets
 from ....utils import (rereferencing, bipolarization, find_nonEEG,
-                       commonaverage, id)
+                       commonaverage, id, EnvelopePyramid)
 
 __all__ = ['uiTools']
 
@@ -81,6 +81,10 @@ class uiTools(object):
                 # Set to ignore :
                 to_ignore[idinlst] = k.isChecked()
 
+        # Re-referencing methods are linear combinations of channels. They
+        # are applied on the identity matrix to get the mixing matrix, which
+        # is then lazily applied to the data windows :
+        mix = np.eye(len(self._channels), dtype=np.float32)
         # Get the current selected method :
         idx = int(self._ToolsRefMeth.currentIndex())
         # Single channel :
@@ -88,17 +92,24 @@ class uiTools(object):
             # Get selected channel :
             idchan = idx = self._ToolsRefLst.currentIndex()
             # Re-referencing :
-            self._data, self._channels, consider = rereferencing(
-                                            self._data, self._channels, idchan,
+            mix, self._channels, consider = rereferencing(
+                                            mix, self._channels, idchan,
                                             to_ignore)
             self._chanChecks[idx].setChecked(False)
         elif idx == 1:  # Common average
-            self._data, self._channels, consider = commonaverage(
-                                     self._data, self._channels, to_ignore)
+            mix, self._channels, consider = commonaverage(
+                                     mix, self._channels, to_ignore)
         elif idx == 2:  # Bipolarization
-            self._data, self._channels, consider = bipolarization(
-                                                  self._data, self._channels,
+            mix, self._channels, consider = bipolarization(
+                                                  mix, self._channels,
                                                   to_ignore)
+        self._data = self._data.combine(mix, self._channels)
+        self._pyramid = EnvelopePyramid(self._data)
+        self._chan.pyramid = self._pyramid
+        # Detection features of the previous data are obsolete :
+        for ctx in self._detectCtx.values():
+            ctx.close()
+        self._detectCtx = {}
 
         # ____________________ Update ____________________
         aM = np.argmax(consider)
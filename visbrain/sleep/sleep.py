@@ -13,9 +13,12 @@ import vispy.scene.cameras as viscam
 from .interface import uiInit, uiElements
 from .visuals import visuals
 from .tools import Tools
-from ..utils import (FixedCam, load_sleepdataset, color2vb, ShortcutPopup,
-                     check_downsampling, MouseEventControl)
-from ..io import dialogLoad, read_hypno
+from ..utils import (FixedCam, RecordingSource, ArraySource, SleepCache,
+                     EnvelopePyramid, Hypnogram,
+                     color2vb, ShortcutPopup, check_downsampling,
+                     MouseEventControl)
+from ..io import (dialogLoad, read_hypno, open_recording,
+                  load_sleepdataset)
 
 sip.setdestroyonexit(False)
 
@@ -48,10 +51,13 @@ class Sleep(uiInit, visuals, uiElements, Tools, MouseEventControl):
         Array of data of shape (n_channels, n_pts)
     channels : list | None
         List of channel names. The length of this list must be n_channels.
+        If a file is used, list of channels to load (only those channels
+        are read from the file). By default, all channels are loaded.
     sf : float | None
         The sampling frequency of raw data.
-    hypno : array_like | None
-        Hypnogram data. Should be a raw vector of shape (n_pts,)
+    hypno : array_like | Hypnogram | None
+        Hypnogram data. Should be a raw vector of shape (n_pts,) or a compact
+        hypnogram (see visbrain.utils.Hypnogram)
     downsample : float | 100.
         The downsampling frequency for the data and hypnogram raw data.
     axis : bool | Fals
@@ -66,13 +72,17 @@ class Sleep(uiInit, visuals, uiElements, Tools, MouseEventControl):
     href : list | ['art', 'wake', 'rem', 'n1', 'n2', 'n3']
         List of sleep stages. This list can be used to changed the display
         order into the GUI.
+    cache : bool | string | SleepCache | None
+        Use an on-disk cache of decoded datasets so that reopening a file is
+        near-instant. Use True for the default cache directory or a string
+        for a custom directory. By default, the cache is not used.
     """
 
     def __init__(self, file=None, hypno_file=None, config_file=None,
                  annotation_file=None,
                  data=None, channels=None, sf=None, hypno=None,
                  downsample=100., axis=False, line='gl', hedit=False,
-                 href=['art', 'wake', 'rem', 'n1', 'n2', 'n3']):
+                 href=['art', 'wake', 'rem', 'n1', 'n2', 'n3'], cache=None):
         """Init."""
         # ====================== APP CREATION ======================
         # Create the app and initialize all graphical elements :
@@ -89,6 +99,8 @@ class Sleep(uiInit, visuals, uiElements, Tools, MouseEventControl):
         MouseEventControl.__init__(self)
 
         # ====================== LOAD FILE ======================
+        # Key of the dataset in the cache (only for files) :
+        ckey = None
         # Load file and convert if needed :
         if not all([k is not None for k in [data, channels, sf]]):
             # --------------- Qt Dialog ---------------
@@ -104,14 +116,25 @@ class Sleep(uiInit, visuals, uiElements, Tools, MouseEventControl):
                                         "Elan (*.hyp);;Text file (*.txt);;"
                                         "CSV file (*.csv);;All files (*.*)")
 
-            # Load dataset :
-            sf, downsample, data, channels, N, start_time = load_sleepdataset(
-                file, downsample)
+            if cache in [None, False]:
+                # Open dataset (only the header is read, data are then read
+                # window by window) :
+                data = open_recording(file, downsample, channels)
+                self._N, self._sfori = data.N, data.sfori
+            else:
+                # Load the down-sampled dataset from the cache :
+                if not isinstance(cache, SleepCache):
+                    cache = SleepCache(None if cache is True else cache)
+                ckey = (file, downsample, channels)
+                (self._sfori, dsf, data, channels, self._N,
+                 start_time) = load_sleepdataset(file, downsample, channels,
+                                                 cache)
+                data = ArraySource(data, dsf or self._sfori, channels,
+                                   start_time)
+            channels, start_time = data.channels, data.start_time
             npts = data.shape[1]
-            # Build the time vector :
-            time = np.arange(N) / sf
-            self._N = N
-            self._sfori = sf
+            # Build the (down-sampled) time vector :
+            time = np.arange(npts) / data.sf
             self._toffset = start_time.hour * 3600 + \
                 start_time.minute * 60 + start_time.second
 
@@ -120,11 +143,9 @@ class Sleep(uiInit, visuals, uiElements, Tools, MouseEventControl):
                 # Load the hypnogram :
                 hypno = read_hypno(hypno_file, npts)
 
-            # Change the sampling frequency if down-sample :
-            if downsample is not None:
-                time = time[::int(np.round(sf / downsample))]
-                sf = downsample
-                downsample = None
+            # The source is already down-sampled :
+            sf = data.sf
+            downsample = None
 
         # Data and sf are givin as an input :
         elif (data is not None) and (sf is not None):
@@ -182,6 +203,16 @@ class Sleep(uiInit, visuals, uiElements, Tools, MouseEventControl):
         self._peaksym = 'disc'
         # Get some data info (min / max / std / mean)
         self._get_dataInfo()
+        # Envelope pyramid used to draw long windows (stored in the cache if
+        # used) :
+        self._pyramid = None
+        if ckey is not None:
+            self._pyramid = cache.get_pyramid(*ckey)
+        if self._pyramid is None:
+            self._pyramid = EnvelopePyramid(self._data)
+            if ckey is not None:
+                cache.set_pyramid(ckey[0], self._pyramid, *ckey[1:])
+        self._pyramid.rescale(self._data.scale)
 
         # ====================== USER & GUI INTERACTION  ======================
         # User <-> GUI :
@@ -218,15 +249,16 @@ class Sleep(uiInit, visuals, uiElements, Tools, MouseEventControl):
         ----------
         sf: float
             The sampling frequency.
-        data: array_like
-            The data to use. Must be a (n_channels, n_pts) array.
+        data: array_like | RecordingSource
+            The data to use. Must be a (n_channels, n_pts) array or a
+            recording source.
         channel : list
             List of string where each element refer to a channel names.
             The length of this list must be n_channels.
-        hypno : array_like | None
-            A row vector of shape (npts,) containing hypnogram values.
-            If the hypnogram is None, this functions returns a row vector
-            fill with zeros.
+        hypno : array_like | Hypnogram | None
+            A row vector of shape (npts,) containing hypnogram values or a
+            compact hypnogram. If the hypnogram is None, this functions
+            returns a row vector fill with zeros.
         time : array_like | None
             The time vector to use. If the time vector is None, it will be
             inferred from data length (be carefull to time consistency).
@@ -238,8 +270,8 @@ class Sleep(uiInit, visuals, uiElements, Tools, MouseEventControl):
         -------
         sf: float
             The sampling frequency
-        data : array_like
-            The float 32 data with a shape of (n_channels, n_pts).
+        data : RecordingSource
+            The (n_channels, n_pts) recording source of float 32 data.
         channels : list
             List of cleaned channel names.
         hypno : array_like
@@ -256,11 +288,11 @@ class Sleep(uiInit, visuals, uiElements, Tools, MouseEventControl):
             raise ValueError("The sampling frequency must be a float number "
                              "(e.g. 1024., 512., etc)")
         sf = float(sf)
-        # Check data shape and format to float32 :
+        # Check data shape :
         # data = np.atleast_2d(data)
-        if data.ndim is not 2:
+        if data.ndim != 2:
             raise ValueError("The data must be a 2D array")
-        if data.shape[0] is not nchan:
+        if data.shape[0] != nchan:
             warn("Organize data array as (n_channels, n_time_points) is more "
                  "memory efficient")
             data = data.T
@@ -293,6 +325,8 @@ class Sleep(uiInit, visuals, uiElements, Tools, MouseEventControl):
         absref = ['Art', 'Wake', 'N1', 'N2', 'N3', 'REM']
         conv = {absint[absref.index(k)]: absint[i] for i, k in enumerate(href)}
         # Check hypnogram and format to float32 :
+        if isinstance(hypno, Hypnogram):
+            hypno = hypno.to_samples(sf, npts)
         if hypno is None:
             hypno = np.zeros((npts,), dtype=np.float32)
         else:
@@ -322,27 +356,27 @@ class Sleep(uiInit, visuals, uiElements, Tools, MouseEventControl):
             chanc.append(k)
 
         # ========================== DOWN-SAMPLING ==========================
+        # Arrays are wrapped into a source which read down-sampled windows :
+        if not isinstance(data, RecordingSource):
+            data = ArraySource(data, sf, downsample=downsample)
+        data.channels = chanc
         if isinstance(downsample, (int, float)):
             # Find frequency ratio :
             fratio = int(round(sf / downsample))
-            # Select time, data and hypno points :
-            data = data[:, ::fratio]
+            # Select time and hypno points :
             time = time[::fratio]
             hypno = hypno[::fratio]
             # Replace sampling frequency :
             sf = float(downsample)
 
         # =========================== SCALING =============================
-        # Check amplitude of the data and if necessary apply re-scaling
-        if np.abs(np.ptp(data, 0).mean()) < 0.1:
-            data *= 1e6
+        # Check amplitude of the data (on the first ten minutes) and if
+        # necessary apply re-scaling
+        if np.abs(np.ptp(data[:, 0:int(600 * sf)], 0).mean()) < 0.1:
+            data.scale = 1e6
 
         # ========================== CONVERSION ===========================
-        # Convert data and hypno to be contiguous and float 32 (for vispy):
-        if not data.flags['C_CONTIGUOUS']:
-            data = np.ascontiguousarray(data, dtype=np.float32)
-        if data.dtype != np.float32:
-            data = data.astype(np.float32, copy=False)
+        # Convert hypno to be contiguous and float 32 (for vispy):
         if not hypno.flags['C_CONTIGUOUS']:
             hypno = np.ascontiguousarray(hypno, dtype=np.float32)
         if hypno.dtype != np.float32:
@@ -355,9 +389,7 @@ class Sleep(uiInit, visuals, uiElements, Tools, MouseEventControl):
     ###########################################################################
     def _get_dataInfo(self):
         """Get some info about data (min, max, std, mean, dist)."""
-        self._datainfo = {'min': self._data.min(1), 'max': self._data.max(1),
-                          'std': self._data.std(1), 'mean': self._data.mean(1),
-                          'dist': self._data.max(1) - self._data.min(1)}
+        self._datainfo = self._data.stats()
 
     def setDefaultState(self):
         """Set the default window state."""
@@ -11,7 +11,8 @@ from vispy import scene
 import vispy.visuals.transforms as vist
 
 from .marker import Markers
-from ...utils import (array2colormap, color2vb, TopoPlot, PrepareData)
+from ...utils import (array2colormap, color2vb, TopoPlot, PrepareData,
+                      EventTable)
 from ...utils.sleep.event import _index_to_event
 
 __all__ = ["visuals"]
@@ -208,6 +209,45 @@ class Detection(object):
         for k in self:
             self[k]['index'] = np.array([])
 
+    def to_table(self, sf, hypno=None):
+        """Export detections as an event table.
+
+        Args:
+            sf: float
+                The sampling frequency of detections.
+
+        Kargs:
+            hypno: np.ndarray, optional, (def: None)
+                Hypnogram vector used to get the sleep stage at the beginning
+                of each event (saved as the 'stage' feature).
+
+        Returns:
+            table: EventTable
+                The table of all detections.
+        """
+        table = EventTable(self.chans, self.items, sf,
+                           () if hypno is None else ('stage',))
+        for k in self:
+            index = self[k]['index']
+            if index.size:
+                feat = {} if hypno is None else {'stage': hypno[index[:, 0]]}
+                table.append(k[0], k[1], index, **feat)
+        return table
+
+    def from_table(self, table):
+        """Replace detections by those of an event table.
+
+        Args:
+            table: EventTable
+                The table of detections.
+        """
+        self.reset()
+        chan, types = table.events['channel'], table.events['type']
+        for c, t in set(zip(chan.tolist(), types.tolist())):
+            key = (table.channels[c], table.types[t])
+            if key in self.dict:
+                self[key]['index'] = table.index(c, t)
+
 
 class ChannelPlot(PrepareData):
     """Plot each channel."""
@@ -226,6 +266,9 @@ class ChannelPlot(PrepareData):
         self._fcn = fcn
         self.visible = np.array([True] + [False] * (len(channels) - 1))
         self.consider = np.ones((len(channels),), dtype=bool)
+        # Envelope pyramid and maximum number of bins to draw long windows :
+        self.pyramid = None
+        self.nbins = 2048
 
         # Get color :
         self.color = color2vb(color)
@@ -287,8 +330,9 @@ class ChannelPlot(PrepareData):
         """Set data to channels.
 
         Args:
-            data: np.ndarray
-                Array of data of shape (n_channels, n_points)
+            data: np.ndarray | RecordingSource
+                Array of data of shape (n_channels, n_points). For a
+                recording source, only the selected window is read.
 
             time: np.ndarray
                 The time vector.
@@ -306,10 +350,19 @@ class ChannelPlot(PrepareData):
         # Manage slice :
         sl = slice(0, data.shape[1]) if sl is None else sl
 
-        # Slice selection (of time and data) :
-        timeSl = time[sl]
+        # Slice selection (of time and data). Windows of several times more
+        # points than nbins (see EnvelopePyramid.level) without signal
+        # processing are drawn using the (min, max) envelope :
+        start, stop, step = sl.indices(data.shape[1])
+        if (self.pyramid is not None) and (not self) and (step == 1) and \
+                (self.pyramid.level(stop - start, self.nbins) > 0):
+            index, dataSl = self.pyramid.line(self.visible, start, stop,
+                                              self.nbins)
+            timeSl = time[index]
+        else:
+            timeSl = time[sl]
+            dataSl = data[self.visible, sl]
         self.x = (timeSl.min(), timeSl.max())
-        dataSl = data[self.visible, sl]
         z = np.full_like(timeSl, .5, dtype=np.float32)
 
         # Prepare the data (only if needed) :
@@ -419,7 +472,7 @@ class Spectrogram(PrepareData):
                                         parent=parent)
 
     def set_data(self, sf, data, time, cmap='rainbow', nfft=30., overlap=0.,
-                 fstart=.5, fend=20., contraste=.5):
+                 fstart=.5, fend=20., contraste=.5, chan=None):
         """Set data to the spectrogram.
 
         Use this method to change data, colormap, spectrogram settings, the
@@ -429,8 +482,9 @@ class Spectrogram(PrepareData):
             sf: float
                 The sampling frequency.
 
-            data: np.ndarray
-                The data to use for the spectrogram. Must be a row vector.
+            data: np.ndarray | RecordingSource
+                The data to use for the spectrogram. Must be a row vector or,
+                if chan is given, a (n_channels, n_points) array or source.
 
             time: np.ndarray
                 The time vector.
@@ -453,6 +507,11 @@ class Spectrogram(PrepareData):
 
             contraste: float, optional, (def: .5)
                 Contraste of the colormap.
+
+            chan: int, optional, (def: None)
+                Row of data to use. If given, the spectrogram is computed
+                block by block so that the channel is never entirely loaded
+                (except if the data have to be prepared).
         """
         # =================== CONVERSION ===================
         nperseg = int(round(nfft * sf))
@@ -461,12 +520,12 @@ class Spectrogram(PrepareData):
         # =================== PREPARE DATA ===================
         # Prepare data (only if needed)
         if self:
-            data = self._prepare_data(sf, data.copy(), time)
+            row = data[chan, :] if chan is not None else data.copy()
+            data, chan = self._prepare_data(sf, row, time), None
 
         # =================== COMPUTE ===================
         # Compute the spectrogram :
-        freq, _, mesh = scpsig.spectrogram(data, fs=sf, nperseg=nperseg,
-                                           noverlap=overlap, window='hamming')
+        freq, mesh = self._spectrogram(sf, data, chan, nperseg, overlap)
         mesh = 20 * np.log10(mesh)
 
         # =================== FREQUENCY SELECTION ===================
@@ -498,6 +557,30 @@ class Spectrogram(PrepareData):
         self.rect = (tm, freq.min(), tM-tm, freq.max() - freq.min())
         self.freq = freq
 
+    @staticmethod
+    def _spectrogram(sf, data, chan, nperseg, overlap):
+        """Compute the spectrogram of a row, block of segments by block.
+
+        Segments are independent so that computing them by blocks gives the
+        same result as computing them at once.
+        """
+        if chan is None:
+            data, chan = data[np.newaxis, :], 0
+        npts = data.shape[-1]
+        step = nperseg - overlap
+        nseg = (npts - overlap) // step if nperseg <= npts else 1
+        # Number of segments per block (~2 ** 20 samples) :
+        nblock = max((2 ** 20) // step, 1)
+        freq, mesh = None, []
+        for k in range(0, nseg, nblock):
+            last = min(k + nblock, nseg) - 1
+            stop = npts if nseg == 1 else last * step + nperseg
+            freq, _, m = scpsig.spectrogram(data[chan, k * step:stop], fs=sf,
+                                            nperseg=nperseg, noverlap=overlap,
+                                            window='hamming')
+            mesh.append(m)
+        return freq, np.concatenate(mesh, axis=1)
+
     def clean(self):
         """Clean indicators."""
         pos = np.zeros((3, 4), dtype=np.float32)
@@ -981,12 +1064,13 @@ class visuals(vbShortcuts):
                                  width=self._lw, color_detection=self._indicol,
                                  parent=self._chanCanvas,
                                  fcn=self._fcn_sliderMove)
+        self._chan.pyramid = self._pyramid
 
         # =================== SPECTROGRAM ===================
         # Create a spectrogram object :
         self._spec = Spectrogram(camera=cameras[1], fcn=self._fcn_specSetData,
                                  parent=self._specCanvas.wc.scene)
-        self._spec.set_data(sf, data[0, ...], time, cmap=self._defcmap)
+        self._spec.set_data(sf, data, time, cmap=self._defcmap, chan=0)
         # Create a visual indicator for spectrogram :
         self._specInd = Indicator(name='spectro_indic', visible=True, alpha=.3,
                                   parent=self._specCanvas.wc.scene)
@@ -1,9 +1,14 @@
 """Set of tools to filter data."""
 
 import numpy as np
-from scipy.signal import butter, filtfilt, lfilter, bessel, welch
+from functools import lru_cache
+from scipy.signal import (butter, bessel, sosfilt, sosfiltfilt, welch,
+                          get_window)
+from numpy.lib.stride_tricks import as_strided
+from scipy.fftpack import next_fast_len
 
-__all__ = ['filt', 'morlet', 'ndmorlet', 'morlet_power', 'welch_power']
+__all__ = ['filt', 'filter_sos', 'StreamingFilter', 'morlet', 'ndmorlet',
+           'morlet_filterbank', 'morlet_power', 'welch_power']
 
 #############################################################################
 # FILTERING
@@ -47,6 +52,51 @@ def filt(sf, f, x, btype='bandpass', order=3, method='butterworth',
         xfilt: np.ndarray
             Filtered data.
     """
+    # Get (cached) second-order sections :
+    f = tuple([float(k) for k in np.ravel(f)])
+    sos = filter_sos(float(sf), f, int(order), btype, method)
+    # Filter single precision data in single precision (the cached design is
+    # copied as scipy needs a writable array) :
+    x = np.asarray(x)
+    sos = sos.astype(np.float32 if x.dtype == np.float32 else np.float64)
+
+    # Apply filter :
+    if way == 'filtfilt':
+        return sosfiltfilt(sos, x, axis=axis)
+    elif way == 'lfilter':
+        return sosfilt(sos, x, axis=axis)
+
+
+@lru_cache(maxsize=128)
+def filter_sos(sf, f, order=3, btype='bandpass', method='butterworth'):
+    """Design a filter as second-order sections (cached).
+
+    Designs are kept in a least recently used cache so that filtering
+    repeatedly with the same parameters does not design the filter again.
+
+    Args:
+        sf: float
+            The sampling frequency
+
+        f: tuple
+            Frequency vector (2,)
+
+    Kargs:
+        order: int, optional, (def: 3)
+            The filter order.
+
+        btype: string, optional, (def: 'bandpass')
+            The filter type. Choose between bandpass, bandstop, highpass,
+            lowpass.
+
+        method: string, optional, (def: 'butterworth')
+            The type of filter to use. Could be butterworth or bessel.
+
+    Returns:
+        sos: np.ndarray
+            Array of second-order sections of shape (n_sections, 6). The
+            array is shared by all calls and should not be modified.
+    """
     # Normalize frequency vector according to btype :
     if btype in ['bandpass', 'bandstop']:
         fnorm = np.divide(f, .5 * sf)
@@ -57,15 +107,147 @@ def filt(sf, f, x, btype='bandpass', order=3, method='butterworth',
 
     # Get filter coefficients :
     if method == 'butterworth':
-        b, a = butter(order, fnorm, btype=btype)
+        sos = butter(order, fnorm, btype=btype, output='sos')
     elif method == 'bessel':
-        b, a = bessel(order, fnorm, btype=btype)
+        sos = bessel(order, fnorm, btype=btype, output='sos')
+    return sos
+
+
+def _sos_padlen(sos):
+    """Default edge padding of scipy.signal.sosfiltfilt."""
+    return 3 * (2 * len(sos) + 1 - min((sos[:, 2] == 0).sum(),
+                                       (sos[:, 5] == 0).sum()))
+
+
+def _sos_decay(sos, nmax, tol=1e-6):
+    """Number of samples for the impulse response to decay below tol."""
+    impulse = np.zeros((nmax,))
+    impulse[0] = 1.
+    h = np.abs(sosfilt(sos, impulse))
+    return int(np.nonzero(h > tol * h.max())[0][-1]) + 1
+
+
+class StreamingFilter(object):
+    """Filter a signal chunk by chunk.
+
+    In the causal mode ('lfilter'), the state of the filter is carried from
+    one chunk to the next so that the concatenated output is exactly the
+    output of filt(..., way='lfilter') on the whole signal.
+
+    In the zero-phase mode ('filtfilt'), chunks are filtered forward and
+    backward with overlap-save padding : each chunk is filtered with
+    overlap samples of the previous and of the next chunks. Outputs are
+    then delayed by overlap samples and match filt(..., way='filtfilt')
+    away from the end of the signal (the error decays with overlap). The
+    last samples are returned by flush().
+
+    Args:
+        sf: float
+            The sampling frequency
+
+        f: np.ndarray
+            Frequency vector (2,)
+
+    Kargs:
+        btype: string, optional, (def: 'bandpass')
+            The filter type. Choose between bandpass, bandstop, highpass,
+            lowpass.
+
+        order: int, optional, (def: 3)
+            The filter order.
+
+        method: string, optional, (def: 'butterworth')
+            The type of filter to use. Could be butterworth or bessel.
+
+        way: string, optional, (def: 'lfilter')
+            Causal ('lfilter') or zero-phase ('filtfilt') filtering.
+
+        overlap: int, optional, (def: None)
+            Number of samples of overlap-save padding of the zero-phase mode.
+            By default, the length of the impulse response of the filter
+            (down to 1e-6 of its maximum, at most 60 seconds) is used.
+
+        axis: int, optional, (def: -1)
+            The time axis of chunks.
+    """
+
+    def __init__(self, sf, f, btype='bandpass', order=3, method='butterworth',
+                 way='lfilter', overlap=None, axis=-1):
+        """Init."""
+        f = tuple([float(k) for k in np.ravel(f)])
+        self.sos = filter_sos(float(sf), f, int(order), btype, method)
+        self.way, self.axis = way, axis
+        if overlap is None:
+            overlap = _sos_decay(self.sos, int(60 * sf))
+        self.overlap = max(int(overlap), _sos_padlen(self.sos))
+        self.reset()
+
+    def reset(self):
+        """Reset the state of the filter (start a new signal)."""
+        # Causal mode :
+        self._zi = None
+        # Zero-phase mode (pending samples and number of samples already
+        # returned at the beginning of the buffer) :
+        self._buf, self._left = None, 0
+
+    def _filtfilt(self, x):
+        """Zero-phase filtering of the buffer."""
+        padlen = min(_sos_padlen(self.sos), x.shape[-1] - 1)
+        return sosfiltfilt(self.sos.astype(x.dtype), x, axis=-1,
+                           padlen=padlen)
+
+    def process(self, chunk):
+        """Filter a chunk of signal.
+
+        Args:
+            chunk: np.ndarray
+                The chunk of signal.
+
+        Returns:
+            y: np.ndarray
+                The filtered signal. In the zero-phase mode, the output is
+                delayed and can be shorter than the chunk.
+        """
+        x = np.moveaxis(np.asarray(chunk), self.axis, -1)
+        if x.dtype != np.float32:
+            x = x.astype(np.float64)
+        if self.way == 'lfilter':
+            if self._zi is None:
+                self._zi = np.zeros((len(self.sos),) + x.shape[:-1] + (2,),
+                                    dtype=x.dtype)
+            sos = self.sos.astype(x.dtype)
+            y, self._zi = sosfilt(sos, x, axis=-1, zi=self._zi)
+            return np.moveaxis(y, -1, self.axis)
+        # Zero-phase : keep overlap samples after the returned ones :
+        buf = x if self._buf is None else np.concatenate((self._buf, x), -1)
+        n = buf.shape[-1] - self._left - self.overlap
+        if n <= 0:
+            self._buf = buf
+            return np.moveaxis(buf[..., 0:0], -1, self.axis)
+        y = self._filtfilt(buf)[..., self._left:self._left + n]
+        # Keep overlap samples already returned as left context :
+        stop = self._left + n
+        keep = max(stop - self.overlap, 0)
+        self._buf, self._left = buf[..., keep:], stop - keep
+        return np.moveaxis(y, -1, self.axis)
+
+    def flush(self):
+        """Get the last filtered samples of the zero-phase mode.
+
+        The state of the filter is then reset.
+
+        Returns:
+            y: np.ndarray
+                The last filtered samples (None in the causal mode or if no
+                samples are pending).
+        """
+        y = None
+        if (self.way == 'filtfilt') and (self._buf is not None):
+            y = self._filtfilt(self._buf)[..., self._left:]
+            y = np.moveaxis(y, -1, self.axis)
+        self.reset()
+        return y
 
-    # Apply filter :
-    if way == 'filtfilt':
-        return filtfilt(b, a, x, axis=axis)
-    elif way == 'lfilter':
-        return lfilter(b, a, x, axis=axis)
 
 #############################################################################
 # WAVELET
@@ -125,19 +307,16 @@ def morlet(x, sf, f, width=7.0):
         xout: np.ndarray, shape (N,)
             The complex decomposition of the signal x.
     """
-    # Get the wavelet :
-    m = _morlet_wlt(sf, f, width)
-
-    # Compute morlet :
-    y = np.convolve(x, m)
-    xout = y[int(np.ceil(len(m) / 2)) - 1:int(len(y) - np.floor(len(m) / 2))]
-
-    return xout
+    return morlet_filterbank(x, sf, [f], width)[0, :]
 
 
-def ndmorlet(x, sf, f, axis=0, get=None, width=7.0):
+def ndmorlet(x, sf, f, axis=0, get=None, width=7.0, dtype=np.complex128,
+             out=None):
     """Complex decomposition using Morlet's wlt for a multi-dimentional array.
 
+    The convolution is computed in the frequency domain for all vectors
+    along axis at once.
+
     Args:
     x: array
         The signal to use for the complex decomposition.
@@ -151,31 +330,151 @@ def ndmorlet(x, sf, f, axis=0, get=None, width=7.0):
     axis: integer, optional, (def: 0)
         Specify the axis where is located the time dimension
 
+    get: string, optional, (def: None)
+        Get the 'amplitude', the 'power' or the 'phase' of the decomposition.
+        If None, the complex decomposition is returned.
+
     width: float, optional, (def: 7.0)
         Width of the wavelet
 
+    dtype: type, optional, (def: np.complex128)
+        Complex type of the decomposition (e.g np.complex64). If get is not
+        None, the output has the corresponding real type.
+
+    out: array, optional, (def: None)
+        Preallocated output array, same shape as x.
+
     Returns:
         xout: array, same shape as x
-            Complex decomposition of x.
+            Complex decomposition of x (or its amplitude / power / phase).
     """
+    dtype = np.dtype(dtype)
     # Get the wavelet :
     m = _morlet_wlt(sf, f, width)
+    xt = np.moveaxis(np.asarray(x), axis, -1)
+    # Amplitude / power are directly computed block by block :
+    if get in ['amplitude', 'power']:
+        if out is None:
+            out = np.empty(x.shape, dtype=dtype.type(0).real.dtype)
+        _wavelet_conv(xt, [m], np.moveaxis(out, axis, -1)[np.newaxis, ...],
+                      get)
+        return out
+    # Complex decomposition (directly into out if possible) :
+    if (get is None) and (out is not None):
+        xf = out
+    else:
+        xf = np.empty(x.shape, dtype=dtype)
+    _wavelet_conv(xt, [m], np.moveaxis(xf, axis, -1)[np.newaxis, ...])
+    if get is None:
+        return xf
+    # Get phase :
+    if out is None:
+        out = np.empty(x.shape, dtype=xf.real.dtype)
+    if get == 'phase':
+        out[...] = np.angle(xf)
+        return out
+
+
+def _wavelet_conv(x, wlts, out, get=None):
+    """Convolve vectors with several wavelets using overlap-save.
+
+    Each block of the signal is transformed once (real FFT) and multiplied
+    by the spectra of all wavelets. The inverse transforms directly give
+    the final output samples of the block, so that the amplitude or the
+    power can be computed block by block.
+
+    Args:
+        x: np.ndarray, shape (..., N)
+            Real signals to convolve (along the last axis).
+
+        wlts: list
+            List of n_bands complex wavelets.
+
+        out: np.ndarray, shape (n_bands, ..., N)
+            Output array of the convolutions ('same' mode, centered like
+            morlet()).
 
-    # Define a morlet function :
-    def morletFcn(xt):
-        # Compute morlet :
-        y = np.convolve(xt, m)
-        return y[int(np.ceil(len(m) / 2)) - 1:int(len(y) - np.floor(
-                                                                len(m) / 2))]
+    Kargs:
+        get: string, optional, (def: None)
+            Get the 'amplitude' or the 'power' of the convolutions. If None,
+            the complex convolutions are returned.
+    """
+    npts = x.shape[-1]
+    m = max([len(k) for k in wlts])
+    # Index of the first output sample in the full convolution of each band :
+    shift = [int(np.ceil(len(k) / 2)) - 1 for k in wlts]
+    # FFT and block lengths (blocks start m - 1 samples before output) :
+    nfft = next_fast_len(max(8 * m, 2 ** 13))
+    nfft = min(nfft, next_fast_len(npts + m - 1 + max(shift)))
+    block = nfft - m + 1 - max(shift)
+    half = nfft // 2 + 1
+    # Spectra of all wavelets, broadcastable with the spectra of x :
+    wspec = np.array([np.fft.fft(k, nfft) for k in wlts])
+    wspec = wspec.reshape((len(wlts),) + (1,) * (x.ndim - 1) + (nfft,))
+    xspec = np.empty(x.shape[:-1] + (nfft,), dtype=complex)
+    for b in range(0, npts, block):
+        # Input samples of the block (zero-padded outside of x) :
+        beg, end = b - m + 1, b - m + 1 + nfft
+        if (beg < 0) or (end > npts):
+            seg = np.zeros(x.shape[:-1] + (nfft,), dtype=x.dtype)
+            seg[..., max(-beg, 0):min(npts, end) - beg] = x[
+                ..., max(beg, 0):min(npts, end)]
+        else:
+            seg = x[..., beg:end]
+        # Full spectrum of the real block :
+        xspec[..., :half] = np.fft.rfft(seg, axis=-1)
+        xspec[..., half:] = np.conj(xspec[..., nfft - half:0:-1])
+        y = np.fft.ifft(wspec * xspec[np.newaxis, ...], axis=-1)
+        n = min(block, npts - b)
+        for k, s in enumerate(shift):
+            yk, ok = y[k, ..., m - 1 + s:m - 1 + s + n], out[k, ..., b:b + n]
+            if get is None:
+                ok[...] = yk
+            else:
+                np.abs(yk, out=ok)
+                if get == 'power':
+                    np.square(ok, out=ok)
+
+
+def morlet_filterbank(x, sf, f, width=7.0, get=None):
+    """Complex decomposition of a signal in several bands of Morlet wavelets.
+
+    The convolution with each wavelet is computed in the frequency domain
+    using overlap-save : the spectrum of each block of the signal is
+    computed once and multiplied by the spectra of all wavelets. The output
+    is the same as calling morlet() for each frequency.
+
+    Args:
+        x: np.ndarray, shape (N,)
+            The signal to use for the complex decomposition. Must be
+            a vector of length N.
+
+        sf: float
+            Sampling frequency
+
+        f: np.ndarray, shape (n_bands,)
+            Central frequency of each wavelet.
+
+    Kargs:
+        width: float, optional, (def: 7.0)
+            Width of the wavelets
+
+        get: string, optional, (def: None)
+            Get the 'amplitude' or the 'power' of the decomposition
+            (computed without storing the complex decomposition). If None,
+            the complex decomposition is returned.
 
-    xf = np.apply_along_axis(morletFcn, axis, x)
-    # Get amplitude / power / phase :
-    if get == 'amplitude':
-        return np.abs(xf)
-    elif get == 'power':
-        return np.square(np.abs(xf))
-    elif get == 'phase':
-        return np.angle(xf)
+    Returns:
+        xout: np.ndarray, shape (n_bands, N)
+            The complex decomposition of the signal x in each band (or its
+            amplitude / power).
+    """
+    x = np.asarray(x).ravel()
+    wlts = [_morlet_wlt(sf, k, width) for k in np.atleast_1d(f)]
+    xout = np.empty((len(wlts), len(x)), dtype=complex if get is None else
+                    float)
+    _wavelet_conv(x, wlts, xout, get)
+    return xout
 
 
 def morlet_power(x, freqs, sf, norm=True):
@@ -204,12 +503,8 @@ def morlet_power(x, freqs, sf, norm=True):
     """
     # Build frequency vector :
     f = np.c_[freqs[0:-1], freqs[1::]].mean(1)
-    # Get wavelet transform :
-    xpow = np.zeros((len(f), len(x)), dtype=np.float)
-    for num, k in enumerate(f):
-        xpow[num, :] = np.abs(morlet(x, sf, k))
-    # Compute inplace power :
-    np.power(xpow, 2, out=xpow)
+    # Get the power of the wavelet transform of all bands at once :
+    xpow = morlet_filterbank(x, sf, f, get='power')
     # Normalize by the band sum :
     if norm:
         sum_pow = xpow.sum(0).reshape(1, -1)
@@ -220,10 +515,21 @@ def morlet_power(x, freqs, sf, norm=True):
 def welch_power(x, fMin, fMax, sf, window_s=30, norm=True):
     """Compute bandwise-normalized power of data using welch.
 
+    The signal is split into windows of window_s seconds and the power
+    spectrum of each window is estimated using Welch's method (Hann
+    segments of 10 seconds with 50% overlap). Periodograms of all the
+    segments of all windows are computed with batched FFTs.
+
     Args:
         x: np.ndarray
             Signal
 
+        fMin: float | array_like
+            Lower frequency of the band(s) (multiple of 0.1 Hz).
+
+        fMax: float | array_like
+            Upper frequency of the band(s) (multiple of 0.1 Hz).
+
         sf: int
             Downsampling frequency
 
@@ -234,22 +540,62 @@ def welch_power(x, fMin, fMax, sf, window_s=30, norm=True):
         norm: boolean, optional (def True)
             If True, return normalized band power
 
+    Returns:
+        power: np.ndarray
+            The (normalized) mean power of each window of shape (n_windows,)
+            or (n_bands, n_windows) if several bands are given.
     """
     sf = int(sf)
     freq_spacing = 0.1
-    f_vector = np.arange(0, sf / 2 + freq_spacing, freq_spacing)
-    idx_fMin = np.where(f_vector == fMin)[0][0]
-    idx_fMax = np.where(f_vector == fMax)[0][0] + 1
-    delta_spec = np.array([], dtype=float)
-    delta_spec_norm = np.array([], dtype=float)
-
-    for i in np.arange(0, len(x), window_s * sf):
-        f, Pxx_spec = welch(x[i:i + window_s * sf], sf, 'hanning',
-                            nperseg=sf * (1 / freq_spacing),
-                            scaling='spectrum')
-        mean_delta = np.mean(Pxx_spec[idx_fMin:idx_fMax, ])
-        norm_delta = np.sum(Pxx_spec[idx_fMin:idx_fMax, ]) / np.sum(Pxx_spec)
-        delta_spec = np.append(delta_spec, mean_delta)
-        delta_spec_norm = np.append(delta_spec_norm, norm_delta)
-
-    return delta_spec_norm if norm else delta_spec
+    nperseg = int(sf * (1 / freq_spacing))
+    nwin = int(window_s * sf)
+    # Index of the frequency bands :
+    bands = np.c_[np.atleast_1d(fMin), np.atleast_1d(fMax)]
+    idx = np.round(bands / freq_spacing).astype(int)
+    idx[:, 1] += 1
+    nep, nfull = -(-len(x) // nwin), len(x) // nwin
+    bpow = np.empty((len(bands), nep), dtype=float)
+    tpow = np.empty((nep,), dtype=float)
+
+    # Windows that contain at least one complete segment :
+    if nwin >= nperseg:
+        win = get_window('hann', nperseg)
+        step = nperseg // 2
+        nseg = (nwin - nperseg) // step + 1
+        # Spectrum scaling of the one-sided periodogram :
+        scale = np.full((nperseg // 2 + 1,), 2. / win.sum() ** 2)
+        scale[0] /= 2.
+        if not nperseg % 2:
+            scale[-1] /= 2.
+        xc = np.ascontiguousarray(x[:nfull * nwin], dtype=float)
+        bs = xc.strides[0]
+        # Process windows by chunks to bound the memory usage :
+        chunk = max(2 ** 22 // (nseg * nperseg), 1)
+        for k in range(0, nfull, chunk):
+            n = min(chunk, nfull - k)
+            # (n_windows, n_segments, nperseg) view of the signal :
+            seg = as_strided(xc[k * nwin:], shape=(n, nseg, nperseg),
+                             strides=(nwin * bs, step * bs, bs))
+            seg = seg - seg.mean(-1, keepdims=True)
+            pxx = np.abs(np.fft.rfft(seg * win, axis=-1)) ** 2
+            pxx = pxx.mean(1) * scale
+            for b, (i_min, i_max) in enumerate(idx):
+                bpow[b, k:k + n] = pxx[:, i_min:i_max].sum(1)
+            tpow[k:k + n] = pxx.sum(1)
+        first = nfull
+    else:
+        first = 0
+
+    # Remaining (shorter) windows :
+    for k in range(first, nep):
+        f, pxx = welch(x[k * nwin:(k + 1) * nwin], sf, 'hann',
+                       nperseg=nperseg, scaling='spectrum')
+        for b, (i_min, i_max) in enumerate(idx):
+            bpow[b, k] = pxx[i_min:i_max].sum()
+        tpow[k] = pxx.sum()
+
+    if norm:
+        bpow /= tpow[np.newaxis, :]
+    else:
+        bpow /= (idx[:, 1] - idx[:, 0])[:, np.newaxis]
+    return bpow[0, :] if np.isscalar(fMin) else bpow
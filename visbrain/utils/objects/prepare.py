@@ -54,7 +54,8 @@ class PrepareData(object):
             else:
                 # Compute ndwavelet :
                 f = np.array([self.fstart, self.fend]).mean()
-                data = ndmorlet(data, sf, f, axis=self.axis, get=self.dispas)
+                data = ndmorlet(data, sf, f, axis=self.axis, get=self.dispas,
+                                dtype=np.complex64)
 
         return data
 
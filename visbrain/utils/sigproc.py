@@ -4,8 +4,8 @@ import numpy as np
 from warnings import warn
 
 
-__all__ = ('normalize', 'movingaverage', 'derivative', 'tkeo', 'soft_thresh',
-           'zerocrossing', 'power_of_ten')
+__all__ = ('normalize', 'movingaverage', 'movingrms', 'movingstd',
+           'derivative', 'tkeo', 'soft_thresh', 'zerocrossing', 'power_of_ten')
 
 
 def normalize(x, tomin=0., tomax=1.):
@@ -46,13 +46,50 @@ def normalize(x, tomin=0., tomax=1.):
         return x
 
 
-def movingaverage(x, window, sf):
+def _moving_sum(x, window, axis=-1, block=2 ** 16):
+    """Centered moving sum of window samples (zero outside of x).
+
+    The sum is computed in O(N) using float64 cumulative sums. Cumulative
+    sums restart at each block of samples so that the rounding error does
+    not grow with the length of x. The alignment is the same as
+    np.convolve(x, np.ones(window), 'same').
+    """
+    x = np.moveaxis(np.asarray(x), axis, -1)
+    npts = x.shape[-1]
+    left, right = window // 2, (window - 1) // 2
+    block = max(block, 4 * window)
+    out = np.empty(x.shape, dtype=np.float64)
+    for b in range(0, npts, block):
+        e = min(b + block, npts)
+        # Samples needed by the block :
+        beg, end = max(b - left, 0), min(e + right, npts)
+        csum = np.zeros(x.shape[:-1] + (end - beg + 1,), dtype=np.float64)
+        np.cumsum(x[..., beg:end], axis=-1, dtype=np.float64,
+                  out=csum[..., 1:])
+        n = np.arange(b, e)
+        hi = np.minimum(n + right + 1, npts) - beg
+        lo = np.maximum(n - left, 0) - beg
+        out[..., b:e] = csum[..., hi] - csum[..., lo]
+    return np.moveaxis(out, -1, axis)
+
+
+def _window_samples(window, sf):
+    """Convert a window in ms into a number of samples."""
+    return int(window / (1000 / sf))
+
+
+def movingaverage(x, window, sf, axis=-1):
     """Perform a moving average.
 
     Equivalent to a lowpass filter where lowpass frequency is defined by:
         LowpassFreq = (1 / window) * 1000
         e.g. if window = 100, LowpassFreq = 10 Hz
 
+    Short windows (up to 256 samples) use np.convolve(x, boxcar, 'same')
+    so that the output is exactly the same (thresholds are often applied to
+    moving averages of piecewise constant signals). Longer windows are
+    computed in O(N) using cumulative sums, with the same alignment.
+
     Args:
         x: np.ndarray
             Signal
@@ -63,11 +100,90 @@ def movingaverage(x, window, sf):
         sf: int
             Downsampling frequency
 
+    Kargs:
+        axis: int, optional, (def: -1)
+            Axis along which to compute the moving average.
+
+    Returns:
+        sma: np.ndarray
+            The moving average (float32 if x is float32, float64 otherwise).
+    """
+    window = _window_samples(window, sf)
+    x = np.asarray(x)
+    dtype = np.float32 if x.dtype == np.float32 else np.float64
+    if (window <= 256) or (x.shape[axis] < window):
+        # np.convolve 'same' returns window points if x is shorter :
+        weights = np.repeat(1.0, window) / window
+        if x.ndim == 1:
+            sma = np.convolve(x, weights, 'same')
+        else:
+            sma = np.apply_along_axis(np.convolve, axis, x, weights, 'same')
+        return sma.astype(dtype, copy=False)
+    return (_moving_sum(x, window, axis) / window).astype(dtype, copy=False)
+
+
+def movingrms(x, window, sf, axis=-1):
+    """Perform a moving root mean square.
+
+    Args:
+        x: np.ndarray
+            Signal
+
+        window: int
+            Time (ms) window to compute moving RMS
+
+        sf: int
+            Downsampling frequency
+
+    Kargs:
+        axis: int, optional, (def: -1)
+            Axis along which to compute the moving RMS.
+
+    Returns:
+        rms: np.ndarray
+            The moving RMS (same alignment as movingaverage).
+    """
+    x = np.asarray(x)
+    return np.sqrt(movingaverage(np.square(x), window, sf, axis))
+
+
+def movingstd(x, window, sf, axis=-1):
+    """Perform a moving standard deviation.
+
+    Args:
+        x: np.ndarray
+            Signal
+
+        window: int
+            Time (ms) window to compute moving standard deviation
+
+        sf: int
+            Downsampling frequency
+
+    Kargs:
+        axis: int, optional, (def: -1)
+            Axis along which to compute the moving standard deviation.
+
+    Returns:
+        std: np.ndarray
+            The moving standard deviation (same alignment as
+            movingaverage).
     """
-    window = int(window / (1000 / sf))
-    weights = np.repeat(1.0, window) / window
-    sma = np.convolve(x, weights, 'same')
-    return sma
+    x = np.asarray(x)
+    # Moments are computed around the mean of x to avoid the cancellation
+    # of E[x ** 2] - E[x] ** 2 when the offset is large :
+    off = x.mean(axis=axis, keepdims=True, dtype=np.float64)
+    y = x - off
+    # Proportion of zeros padded to x in each window (see movingaverage) :
+    shape = [1] * x.ndim
+    shape[axis] = -1
+    pad = 1. - movingaverage(np.ones((x.shape[axis],)), window, sf)
+    pad = pad.reshape(shape)
+    mean = movingaverage(y, window, sf, axis) - off * pad
+    var = movingaverage(np.square(y), window, sf, axis)
+    var += np.square(off) * pad - np.square(mean)
+    dtype = np.float32 if x.dtype == np.float32 else np.float64
+    return np.sqrt(np.maximum(var, 0.)).astype(dtype, copy=False)
 
 
 def derivative(x, window, sf):
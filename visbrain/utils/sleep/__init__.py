@@ -1,3 +1,8 @@
 from .detection import *
 from .fileconvert import *
+from .recording import *
+from .cache import *
+from .pyramid import *
+from .eventstore import *
 from .hypnoprocessing import *
+from .detectioncontext import *
@@ -0,0 +1,130 @@
+"""Recording source of BrainVision (*.eeg + *.vhdr) files.
+
+This module is only imported when a file of this format is opened (see the
+sleep reader registry of visbrain.io).
+"""
+import os
+import re
+import datetime
+import numpy as np
+
+from .recording import RecordingSource
+
+__all__ = ['BrainVisionSource']
+
+
+class BrainVisionSource(RecordingSource):
+    """Read BrainVision file.
+
+    Poor man's version of https: // gist.github.com / breuderink / 6266871
+
+    The binary data file is memory-mapped. Supported parameters are:
+        - Data format: Binary
+        - Orientation: Multiplexed or Vectorized
+        - Format: int16, int32 or float32
+
+    Args:
+        path: str
+            Filename(with full path) to .eeg file
+
+    Kargs:
+        downsample: float, optional, (def: None)
+            The downsampling frequency.
+
+        channels: list, optional, (def: None)
+            List of channel names (or indices) to read.
+    """
+
+    # Binary formats and corresponding little-endian numpy types :
+    formats = {'INT_16': '<i2', 'INT_32': '<i4', 'IEEE_FLOAT_32': '<f4'}
+
+    def __init__(self, path, downsample=None, channels=None):
+        """Init."""
+        assert os.path.splitext(path)[1] == '.eeg'
+
+        header = os.path.splitext(path)[0] + '.vhdr'
+        marker = os.path.splitext(path)[0] + '.vmrk'
+
+        assert os.path.isfile(path)
+        assert os.path.isfile(header)
+
+        # Read header
+        with open(header, 'r', errors='ignore') as f:
+            ent = [k.strip() for k in f.read().splitlines()]
+
+        data_orient = 'MULTIPLEXED'
+        binary_format = 'INT_16'
+        for item in ent:
+            if 'NumberOfChannels=' in item:
+                n_chan = int(re.findall(r'\d+', item)[0])
+            elif 'SamplingInterval=' in item:
+                si = float(re.findall(r"[-+]?\d*\.\d+|\d+", item)[0])
+                sf = 1 / (si * 0.000001)
+            elif 'DataFormat' in item:
+                data_format = item.split('=')[1]
+            elif 'BinaryFormat' in item:
+                binary_format = item.split('=')[1]
+            elif 'DataOrientation' in item:
+                data_orient = item.split('=')[1]
+
+        # Check binary format
+        assert "BINARY" in data_format
+        if binary_format not in self.formats:
+            raise ValueError("BrainVision binary format " + binary_format +
+                             " is not supported. Use " +
+                             ", ".join(self.formats.keys()))
+        if data_orient not in ['MULTIPLEXED', 'VECTORIZED']:
+            raise ValueError("BrainVision data orientation " + data_orient +
+                             " is not supported. Use MULTIPLEXED or "
+                             "VECTORIZED")
+
+        # Extract channel labels and resolution
+        start_label = [k.startswith('Ch1=') for k in ent].index(True)
+        chan = []
+        resolution = np.ones(shape=n_chan)
+
+        for i, j in enumerate(range(start_label, start_label + n_chan)):
+            info = ent[j].split('=', 1)[1].split(',')
+            chan.append(info[0])
+            if len(info) > 2 and info[2]:
+                resolution[i] = float(info[2])
+
+        # Read marker file (if present) to extract recording time
+        start_time = datetime.time(0, 0, 0)
+        if os.path.isfile(marker):
+            with open(marker, 'r', errors='ignore') as f:
+                vmrk = f.read().splitlines()
+
+            for item in vmrk:
+                if 'New Segment' in item:
+                    st = re.split(r'\W+', item.strip())[-1]
+                    if len(st) >= 14:
+                        start_time = datetime.time(
+                            int(st[8:10]), int(st[10:12]), int(st[12:14]))
+
+        # Memory-map the samples :
+        dtype = np.dtype(self.formats[binary_format])
+        n_samples = int(os.path.getsize(path) / (dtype.itemsize * n_chan))
+
+        self.path = path
+        self._multiplexed = data_orient == 'MULTIPLEXED'
+        if self._multiplexed:
+            shape = (n_samples, n_chan)
+        else:
+            shape = (n_chan, n_samples)
+        self._raw = np.memmap(path, dtype=dtype, mode='r', shape=shape)
+        self._resolution = resolution[:, np.newaxis].astype(np.float32)
+
+        RecordingSource.__init__(self, sf, chan, n_samples, start_time,
+                                 downsample, channels)
+
+    def _read(self, idx, start, stop, out=None):
+        """Read and multiply by resolution."""
+        if self._multiplexed:
+            raw = self._raw[start:stop, idx].T
+        else:
+            raw = self._raw[idx, start:stop]
+        if out is None:
+            out = np.empty(raw.shape, dtype=np.float32)
+        return np.multiply(raw, self._resolution[idx, :], out=out,
+                           casting='unsafe')
@@ -0,0 +1,279 @@
+"""On-disk cache of decoded sleep datasets.
+
+The cache stores the float32 down-sampled data of a recording next to its
+metadata so that reopening the same recording does not require to parse,
+calibrate and down-sample the raw file again. Each entry is made of :
+
+- <key>.npy : the uncompressed (n_channels, n_points) float32 data, loaded
+  as a read-only memory map.
+- <key>.npz : the metadata (channel names, sampling frequencies, number of
+  original samples and starting time).
+- <key>.pyr.npy / <key>.pyr.npz : the (optional) envelope pyramid of the
+  data, also loaded as a read-only memory map.
+
+Entries are identified by a key built from the absolute path, size and
+modification time of the file, the down-sampling frequency and the selected
+channels. When the total size of the cache exceeds its limit, the least
+recently used entries are removed.
+"""
+import os
+import datetime
+import hashlib
+import uuid
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from .pyramid import EnvelopePyramid
+
+__all__ = ['SleepCache']
+
+
+class SleepCache(object):
+    """Least recently used on-disk cache of decoded sleep datasets.
+
+    Kargs:
+        directory: str, optional, (def: None)
+            Directory where entries are stored. By default, entries are
+            stored in ~/.visbrain/sleep_cache.
+
+        max_size: int, optional, (def: 2 * 1024 ** 3)
+            Maximum size of the cache (in bytes).
+    """
+
+    def __init__(self, directory=None, max_size=2 * 1024 ** 3):
+        """Init."""
+        if directory is None:
+            directory = os.path.join(os.path.expanduser('~'), '.visbrain',
+                                     'sleep_cache')
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.directory = directory
+        self.max_size = int(max_size)
+
+    def key(self, path, downsample=None, channels=None):
+        """Get the key of a recording.
+
+        Args:
+            path: str
+                Filename (with full path) of the recording.
+
+        Kargs:
+            downsample: float, optional, (def: None)
+                The downsampling frequency.
+
+            channels: list, optional, (def: None)
+                List of loaded channels.
+
+        Returns:
+            key: str
+                The key of the entry.
+        """
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        desc = [path, st.st_size, st.st_mtime_ns, downsample, channels]
+        return hashlib.sha1(repr(desc).encode('utf-8')).hexdigest()
+
+    def _files(self, key):
+        """Get the data, metadata and pyramid filenames of an entry.
+
+        The pyramid filename has no extension (see EnvelopePyramid.save).
+        """
+        base = os.path.join(self.directory, key)
+        return base + '.npy', base + '.npz', base + '.pyr'
+
+    def get(self, path, downsample=None, channels=None):
+        """Get a cached recording.
+
+        Args:
+            path: str
+                Filename (with full path) of the recording.
+
+        Kargs:
+            downsample: float, optional, (def: None)
+                The downsampling frequency.
+
+            channels: list, optional, (def: None)
+                List of loaded channels.
+
+        Returns:
+            entry: tuple | None
+                (sf, downsample, data, chan, N, start_time) like
+                load_sleepdataset, with data as a read-only memory map. None
+                if the recording is not in the cache.
+        """
+        datfile, inffile, _ = self._files(self.key(path, downsample,
+                                                   channels))
+        if not (os.path.isfile(datfile) and os.path.isfile(inffile)):
+            return None
+        # Update access time for the LRU eviction :
+        os.utime(datfile, None)
+        data = np.load(datfile, mmap_mode='r')
+        with np.load(inffile) as inf:
+            ds = float(inf['downsample'])
+            start_time = datetime.time(*[int(k) for k in inf['start_time']])
+            return (float(inf['sf']), ds if ds > 0 else None, data,
+                    [str(k) for k in inf['channels']], int(inf['N']),
+                    start_time)
+
+    def set(self, path, source, downsample=None, channels=None):
+        """Decode a recording source into the cache.
+
+        The data are directly read into the memory-mapped cache file.
+
+        Args:
+            path: str
+                Filename (with full path) of the recording.
+
+            source: RecordingSource
+                The source of the recording.
+
+        Kargs:
+            downsample: float, optional, (def: None)
+                The downsampling frequency used to open the source.
+
+            channels: list, optional, (def: None)
+                List of channels used to open the source.
+
+        Returns:
+            entry: tuple
+                (sf, downsample, data, chan, N, start_time) like
+                load_sleepdataset, with data as a read-only memory map.
+        """
+        key = self.key(path, downsample, channels)
+        datfile, inffile, _ = self._files(key)
+        # Write into temporary files and rename at the end (names are unique
+        # so that several writers of the same entry do not collide) :
+        tmp = self._tmpsuffix()
+        tmpdat, tmpinf = datfile + tmp + '.npy', inffile + tmp + '.npz'
+        out = open_memmap(tmpdat, mode='w+', dtype=np.float32,
+                          shape=source.shape)
+        source.read(out=out)
+        out.flush()
+        del out
+        st = source.start_time
+        np.savez(tmpinf, sf=source.sfori, N=source.N,
+                 downsample=source.downsample or 0.,
+                 channels=np.array(source.channels, dtype=str),
+                 start_time=np.array([st.hour, st.minute, st.second]))
+        os.replace(tmpinf, inffile)
+        os.replace(tmpdat, datfile)
+        # Map the entry before the eviction (which keeps it anyway) :
+        data = np.load(datfile, mmap_mode='r')
+        self.evict(keep=key)
+        return (source.sfori, source.downsample, data, list(source.channels),
+                source.N, datetime.time(st.hour, st.minute, st.second))
+
+    def get_pyramid(self, path, downsample=None, channels=None):
+        """Get the cached envelope pyramid of a recording.
+
+        Args:
+            path: str
+                Filename (with full path) of the recording.
+
+        Kargs:
+            downsample: float, optional, (def: None)
+                The downsampling frequency.
+
+            channels: list, optional, (def: None)
+                List of loaded channels.
+
+        Returns:
+            pyramid: EnvelopePyramid | None
+                The envelope pyramid or None if it is not in the cache.
+        """
+        pyrfile = self._files(self.key(path, downsample, channels))[2]
+        if not os.path.isfile(pyrfile + '.npz'):
+            return None
+        return EnvelopePyramid.load(pyrfile, mmap_mode='r')
+
+    def set_pyramid(self, path, pyramid, downsample=None, channels=None):
+        """Store the envelope pyramid of a recording.
+
+        Args:
+            path: str
+                Filename (with full path) of the recording.
+
+            pyramid: EnvelopePyramid
+                The envelope pyramid.
+
+        Kargs:
+            downsample: float, optional, (def: None)
+                The downsampling frequency.
+
+            channels: list, optional, (def: None)
+                List of loaded channels.
+
+        Returns:
+            pyramid: EnvelopePyramid
+                The envelope pyramid.
+        """
+        pyrfile = self._files(self.key(path, downsample, channels))[2]
+        tmpfile = pyrfile + self._tmpsuffix()
+        pyramid.save(tmpfile)
+        # The metadata file is moved last (get_pyramid checks it) :
+        os.replace(tmpfile + '.npy', pyrfile + '.npy')
+        os.replace(tmpfile + '.npz', pyrfile + '.npz')
+        return pyramid
+
+    def size(self):
+        """Get the total size of the cache (in bytes)."""
+        size = 0
+        for k in os.listdir(self.directory):
+            try:
+                size += os.path.getsize(os.path.join(self.directory, k))
+            except OSError:
+                continue
+        return size
+
+    def evict(self, keep=None):
+        """Remove least recently used entries until the cache fits.
+
+        Several processes can share the cache, so that files can disappear
+        at any time.
+
+        Kargs:
+            keep: str, optional, (def: None)
+                Key of an entry that is never removed (e.g the entry that has
+                just been written).
+        """
+        names = os.listdir(self.directory)
+        keys = [k[:-4] for k in names if k.endswith('.npy') and
+                not k.endswith(('.tmp.npy', '.pyr.npy'))]
+        # Pyramids of removed entries are removed first :
+        orphans = [k[:-8] for k in names if k.endswith('.pyr.npz') and
+                   k[:-8] not in keys]
+        keys.sort(key=lambda k: self._mtime(self._files(k)[0]))
+        total = self.size()
+        # Always keep the most recent entry :
+        for key in orphans + keys[:-1]:
+            if total <= self.max_size:
+                break
+            if key == keep:
+                continue
+            datfile, inffile, pyrfile = self._files(key)
+            for k in [datfile, inffile, pyrfile + '.npy', pyrfile + '.npz']:
+                try:
+                    size = os.path.getsize(k)
+                    os.remove(k)
+                except OSError:
+                    continue
+                total -= size
+
+    @staticmethod
+    def _tmpsuffix():
+        """Get a unique suffix for temporary files (ending with '.tmp')."""
+        return '.' + str(os.getpid()) + '-' + uuid.uuid4().hex + '.tmp'
+
+    @staticmethod
+    def _mtime(filename):
+        """Get the modification time of a file (0 if it was removed)."""
+        try:
+            return os.path.getmtime(filename)
+        except OSError:
+            return 0.
+
+    def clear(self):
+        """Remove all entries."""
+        for k in os.listdir(self.directory):
+            if k.endswith(('.npy', '.npz')):
+                os.remove(os.path.join(self.directory, k))
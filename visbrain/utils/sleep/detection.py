@@ -13,14 +13,24 @@ Perform:
 import numpy as np
 from scipy.signal import hilbert, detrend
 
-from ..filtering import filt, morlet, morlet_power, welch_power
-from ..sigproc import movingaverage, derivative, tkeo
-from .event import (_events_duration, _events_removal, _events_distance_fill,
-                    _event_amplitude)
+from ..sigproc import movingaverage, derivative
+from .detectioncontext import DetectionContext
+from .event import (_events_from_mask, _events_from_index, _events_to_index,
+                    _events_duration, _events_removal, _events_distance_fill,
+                    _events_overlap, _event_amplitude)
 
 __all__ = ['peakdetect', 'remdetect', 'spindlesdetect', 'slowwavedetect',
            'kcdetect', 'mtdetect']
 
+
+def _detection_context(elec, sf, hypno=None):
+    """Get the detection context of a channel (data or context)."""
+    if isinstance(elec, DetectionContext):
+        if hypno is not None:
+            elec.update_hypno(hypno)
+        return elec
+    return DetectionContext(elec, sf, hypno)
+
 ###########################################################################
 # K-COMPLEX DETECTION
 ###########################################################################
@@ -33,7 +43,7 @@ def kcdetect(elec, sf, proba_thr, amp_thr, hypno, nrem_only, tMin, tMax,
     """Perform a K-complex detection.
 
     Args:
-        elec: np.ndarray
+        elec: np.ndarray | DetectionContext
             eeg signal (preferably central electrodes)
 
         sf: float
@@ -108,49 +118,46 @@ def kcdetect(elec, sf, proba_thr, amp_thr, hypno, nrem_only, tMin, tMax,
     # Find if hypnogram is loaded :
     hypLoaded = True if np.unique(hypno).size > 1 and nrem_only else False
 
-    data = elec
+    ctx = _detection_context(elec, sf, hypno)
+    data = ctx.data()
     length = max(data.shape)
 
     # PRE DETECTION
     # Compute delta band power
     # Morlet's wavelet
     freqs = np.array([0.5, 4., 8., 12., 16.])
-    delta_npow, _, _, _ = morlet_power(data, freqs, sf, norm=True)
+    delta_npow, _, _, _ = ctx.morlet_power(freqs, norm=True)
     delta_nfpow = movingaverage(delta_npow, moving_s * 1000, sf)
     # local_delta_nfpow = movingaverage(delta_npow, sf, sf)
     idx_no_delta = np.where(delta_nfpow < delta_thr)[0]
     idx_loc_delta = np.where(delta_npow > np.mean(delta_npow))[0]
 
     # MAIN DETECTION
-    # Bandpass filtering
-    sig_filt = filt(sf, np.array([fMin, fMax]), data)
-    # Taiger-Keaser energy operator
-    sig_transformed = tkeo(sig_filt)
+    # Taiger-Keaser energy operator of the bandpass filtered data
+    sig_transformed = ctx.tkeo([fMin, fMax])
     # Initial thresholding of the TKEO's amplitude
     thresh = np.mean(sig_transformed) + amp_thr * np.std(sig_transformed)
-    idx_sup_thr = np.where(sig_transformed >= thresh)[0]
+    sup_thr = np.zeros(data.shape, dtype=bool)
+    sup_thr[:sig_transformed.size] = sig_transformed >= thresh
 
-    if idx_sup_thr.size > 0:
+    if sup_thr.any():
         # Check if spindles are present in range_spin_sec
-        idx_spin, _, _, _ = spindlesdetect(data, sf, spindles_thresh, hypno,
+        idx_spin, _, _, _ = spindlesdetect(ctx, sf, spindles_thresh, hypno,
                                            nrem_only=False)
 
-        number, _, idx_start, idx_stop = _events_duration(idx_sup_thr, sf)
+        spin_start, spin_stop = _events_from_index(idx_spin)
 
-        spin_bool = np.array([], dtype=np.bool)
-        for i, j in enumerate(idx_start):
-            step = 0.5 * range_spin_sec * sf
-            st_spin = idx_sup_thr[j]
-            is_spin = np.in1d(np.arange(st_spin - step, st_spin + step, 1),
-                              idx_spin, assume_unique=True)
-            spin_bool = np.append(spin_bool, any(is_spin))
-        kc_spin = np.where(spin_bool)[0]
-        idx_kc_spin = idx_sup_thr[_events_removal(idx_start, idx_stop,
-                                                  kc_spin)]
+        # Candidates with a spindle in [start - step, start + step[ :
+        start, stop = _events_from_mask(sup_thr)
+        step = 0.5 * range_spin_sec * sf
+        spin_bool = _events_overlap(np.ceil(start - step), start + step,
+                                    spin_start, spin_stop)
+        idx_kc_spin = _events_to_index(*_events_removal(start, stop,
+                                                        spin_bool))
 
         # Compute probability
         proba = np.zeros(shape=data.shape)
-        proba[idx_sup_thr] += 0.1
+        proba[sup_thr] += 0.1
         proba[idx_no_delta] += 0.1
         proba[idx_loc_delta] += 0.1
         proba[idx_kc_spin] += 0.1
@@ -168,36 +175,28 @@ def kcdetect(elec, sf, proba_thr, amp_thr, hypno, nrem_only, tMin, tMax,
         proba = movingaverage(proba, sf, sf)
 
         # Keep only proba >= proba_thr (user defined threshold)
-        idx_sup_thr = np.intersect1d(idx_sup_thr, np.where(
-                                        proba >= proba_thr)[0], True)
+        sup_thr &= proba >= proba_thr
 
-    if idx_sup_thr.size > 0:
+    if sup_thr.any():
         # K-COMPLEX MORPHOLOGY
-        idx_sup_thr = _events_distance_fill(idx_sup_thr, min_distance_ms, sf)
-        _, duration_ms, idx_start, idx_stop = _events_duration(idx_sup_thr, sf)
-
-        kc_amp, distance_ms = _event_amplitude(data, idx_sup_thr,
-                                               idx_start, idx_stop, sf)
-        good_dur = np.where(np.logical_and(duration_ms > tMin,
-                                           duration_ms < tMax))[0]
+        start, stop = _events_from_mask(sup_thr)
+        start, stop = _events_distance_fill(start, stop, min_distance_ms, sf)
+        _, duration_ms = _events_duration(start, stop, sf)
 
-        good_amp = np.where(np.logical_and(kc_amp > kc_min_amp,
-                                           kc_amp < kc_max_amp))[0]
-        good_dist = np.where(distance_ms > kc_peak_min_distance)[0]
+        kc_amp, distance_ms = _event_amplitude(data, start, stop, sf)
+        good_dur = np.logical_and(duration_ms > tMin, duration_ms < tMax)
+        good_amp = np.logical_and(kc_amp > kc_min_amp, kc_amp < kc_max_amp)
+        good_dist = distance_ms > kc_peak_min_distance
 
-        good_event = np.intersect1d(good_amp, good_dur, True)
-        good_event = np.intersect1d(good_event, good_dist, True)
-        good_idx = _events_removal(idx_start, idx_stop, good_event)
-
-        idx_sup_thr = idx_sup_thr[good_idx]
-        idx_sup_thr = _events_distance_fill(idx_sup_thr, min_distance_ms, sf)
+        start, stop = _events_removal(start, stop,
+                                      good_dur & good_amp & good_dist)
+        start, stop = _events_distance_fill(start, stop, min_distance_ms, sf)
 
         # Export info
-        number, duration_ms, idx_start, idx_stop = _events_duration(
-            idx_sup_thr, sf)
+        number, duration_ms = _events_duration(start, stop, sf)
 
         density = number / (length / sf / 60.)
-        return idx_sup_thr, number, density, duration_ms
+        return _events_to_index(start, stop), number, density, duration_ms
 
     else:
         return np.array([], dtype=int), 0., 0., np.array([], dtype=int)
@@ -213,7 +212,7 @@ def spindlesdetect(elec, sf, threshold, hypno, nrem_only, fMin=12.,
     """Perform a sleep spindles detection.
 
     Args:
-        elec: np.ndarray
+        elec: np.ndarray | DetectionContext
             eeg signal (preferably central electrodes)
 
         sf: float
@@ -265,26 +264,26 @@ def spindlesdetect(elec, sf, threshold, hypno, nrem_only, fMin=12.,
     # Find if hypnogram is loaded :
     hypLoaded = True if np.unique(hypno).size > 1 and nrem_only else False
 
+    # Only use NREM sleep stages :
+    stages = (1, 2, 3) if hypLoaded else None
+    ctx = _detection_context(elec, sf, hypno)
+    data = ctx.data(stages)
     if hypLoaded:
-        data = elec.copy()
-        data[(np.where(np.logical_or(hypno < 1, hypno == 4)))] = 0.
         length = np.count_nonzero(data)
-        idx_zero = np.where(data == 0)[0]
     else:
-        data = elec
         length = max(data.shape)
 
     # Pre-detection
     # Compute relative sigma power
     freqs = np.array([0.5, 4., 8., fMin, fMax])
-    _, _, _, sigma_npow = morlet_power(data, freqs, sf, norm=True)
+    _, _, _, sigma_npow = ctx.morlet_power(freqs, norm=True, stages=stages)
     sigma_nfpow = movingaverage(sigma_npow, sf, sf)
-    idx_sigma = np.where(sigma_nfpow > sigma_thr)[0]
+    sigma = sigma_nfpow > sigma_thr
 
     # Get complex decomposition of filtered data :
     if method == 'hilbert':
         # Bandpass filter
-        data_filt = filt(sf, [fMin, fMax], data, order=4)
+        data_filt = ctx.filt([fMin, fMax], order=4, stages=stages)
         # Hilbert transform on odd-length signals is twice longer. To avoid
         # this extra time, simply set to zero padding.
         # See https://github.com/scipy/scipy/issues/6324
@@ -292,41 +291,35 @@ def spindlesdetect(elec, sf, threshold, hypno, nrem_only, fMin=12.,
             analytic = hilbert(data_filt)
         else:
             analytic = hilbert(data_filt[:-1], len(data_filt))
+        amplitude = np.abs(analytic)
     elif method == 'wavelet':
-        analytic = morlet(data, sf, np.mean([fMin, fMax]))
-
-    amplitude = np.abs(analytic)
+        amplitude = ctx.envelope(np.mean([fMin, fMax]), stages)
 
     if hypLoaded:
-        amplitude[idx_zero] = np.nan
+        amplitude = np.where(data == 0, np.nan, amplitude)
 
     # Define threshold
     thresh = np.nanmean(amplitude) + threshold * np.nanstd(amplitude)
 
     with np.errstate(divide='ignore', invalid='ignore'):
-        idx_sup_thr = np.where(amplitude > thresh)[0]
+        start, stop = _events_from_mask((amplitude > thresh) & sigma)
 
-    if idx_sup_thr.size > 0:
+    if start.size:
 
-        idx_sup_thr = np.intersect1d(idx_sup_thr, idx_sigma, True)
-        idx_sup_thr = _events_distance_fill(idx_sup_thr, min_distance_ms, sf)
+        start, stop = _events_distance_fill(start, stop, min_distance_ms, sf)
 
         # Get where spindles start / end and duration :
-        _, duration_ms, idx_start, idx_stop = _events_duration(idx_sup_thr,
-                                                               sf)
+        _, duration_ms = _events_duration(start, stop, sf)
 
         # Get where min_dur < spindles duration < max_dur :
-        good_dur = np.where(np.logical_and(duration_ms > tMin,
-                                           duration_ms < tMax))[0]
-
-        good_idx = _events_removal(idx_start, idx_stop, good_dur)
+        good_dur = np.logical_and(duration_ms > tMin, duration_ms < tMax)
 
-        idx_sup_thr = idx_sup_thr[good_idx]
+        start, stop = _events_removal(start, stop, good_dur)
 
-        number, duration_ms, _, _ = _events_duration(idx_sup_thr, sf)
+        number, duration_ms = _events_duration(start, stop, sf)
         density = number / (length / sf / 60.)
 
-        return idx_sup_thr, number, density, duration_ms
+        return _events_to_index(start, stop), number, density, duration_ms
 
     else:
         return np.array([], dtype=int), 0., 0., np.array([], dtype=int)
@@ -346,7 +339,7 @@ def remdetect(elec, sf, hypno, rem_only, threshold, tMin=200,
     (REM) during REM sleep.
 
     Args:
-        elec: np.ndarray
+        elec: np.ndarray | DetectionContext
             EOG signal (preferably after artefact rejection using ICA)
 
         sf: int
@@ -396,10 +389,12 @@ def remdetect(elec, sf, hypno, rem_only, threshold, tMin=200,
             Duration (ms) of each REM detected
 
     """
-    if rem_only and 4 in hypno:
-        elec[(np.where(hypno < 4))] = 0
+    # Only use REM sleep stage :
+    stages = 4 if rem_only and 4 in hypno else None
+    ctx = _detection_context(elec, sf, hypno)
+    elec = ctx.data(stages)
+    if stages is not None:
         length = np.count_nonzero(elec)
-        idx_zero = np.where(elec == 0)
     else:
         length = max(elec.shape)
 
@@ -409,34 +404,29 @@ def remdetect(elec, sf, hypno, rem_only, threshold, tMin=200,
     deriv = derivative(sm_sig, deriv_ms, sf)
     # Smooth derivative
     deriv = movingaverage(deriv, moving_ms, sf)
-    # Define threshold
-    if rem_only and 4 in hypno:
-        idThr = np.setdiff1d(np.arange(elec.size), idx_zero)
-    else:
-        idThr = np.arange(elec.size)
-    # Remove extreme values
-    idThr = np.setdiff1d(idThr, np.where(np.abs(sm_sig) > amplitude_art)[0])
+    # Define threshold (without extreme values)
+    idThr = ~(np.abs(sm_sig) > amplitude_art)
+    if stages is not None:
+        idThr &= elec != 0
     # Find supra-threshold values
     thresh = np.mean(deriv[idThr]) + threshold * np.std(deriv[idThr])
-    idx_sup_thr = np.where(deriv > thresh)[0]
+    start, stop = _events_from_mask(deriv > thresh)
 
-    if idx_sup_thr.size:
+    if start.size:
 
         # Find REMs separated by less than min_distance_ms
-        idx_sup_thr = _events_distance_fill(idx_sup_thr, min_distance_ms, sf)
+        start, stop = _events_distance_fill(start, stop, min_distance_ms, sf)
 
-        _, duration_ms, idx_start, idx_stop = _events_duration(idx_sup_thr, sf)
+        _, duration_ms = _events_duration(start, stop, sf)
 
         # Get where min_dur < REM duration < tMax
-        good_dur = np.where(np.logical_and(duration_ms > tMin,
-                                           duration_ms < tMax))[0]
-        good_idx = _events_removal(idx_start, idx_stop, good_dur)
-        idx_sup_thr = idx_sup_thr[good_idx]
+        good_dur = np.logical_and(duration_ms > tMin, duration_ms < tMax)
+        start, stop = _events_removal(start, stop, good_dur)
 
-        number, duration_ms, _, _ = _events_duration(idx_sup_thr, sf)
+        number, duration_ms = _events_duration(start, stop, sf)
         density = number / (length / sf / 60.)
 
-        return idx_sup_thr, number, density, duration_ms
+        return _events_to_index(start, stop), number, density, duration_ms
 
     else:
         return np.array([], dtype=int), 0., 0., np.array([], dtype=int)
@@ -452,7 +442,7 @@ def slowwavedetect(elec, sf, threshold, min_amp=70, max_amp=400,
     """Perform a Slow Wave detection.
 
     Args:
-        elec: np.ndarray
+        elec: np.ndarray | DetectionContext
             eeg signal (preferably frontal electrodes)
 
         sf: float
@@ -497,6 +487,8 @@ def slowwavedetect(elec, sf, threshold, min_amp=70, max_amp=400,
             Duration (ms) of each slow wave period detected
 
     """
+    ctx = _detection_context(elec, sf)
+    elec = ctx.data()
     length = max(elec.shape)
 
     # Get complex decomposition of filtered data in the main EEG freq band:
@@ -506,32 +498,27 @@ def slowwavedetect(elec, sf, threshold, min_amp=70, max_amp=400,
     # delta_nfpow = movingaverage(delta_npow, moving_s * 1000, sf)
 
     # Using Welch's method
-    delta_nfpow = welch_power(elec, fMin, fMax, sf, welch_win_s, norm=True)
+    delta_nfpow = ctx.welch_power(fMin, fMax, welch_win_s, norm=True)
     delta_nfpow = np.repeat(delta_nfpow, welch_win_s * sf)
     delta_nfpow = movingaverage(delta_nfpow, 3 * welch_win_s * sf, sf)
 
     # Normalized power criteria
-    idx_sup_thr = np.where(delta_nfpow > threshold)[0]
+    start, stop = _events_from_mask(delta_nfpow > threshold)
 
-    if idx_sup_thr.size:
+    if start.size:
 
-        _, duration_ms, idx_start, idx_stop = _events_duration(idx_sup_thr, sf)
+        _, duration_ms = _events_duration(start, stop, sf)
 
-        sw_amp, _ = _event_amplitude(elec, idx_sup_thr, idx_start,
-                                     idx_stop, sf)
+        sw_amp, _ = _event_amplitude(elec, start, stop, sf)
 
-        good_amp = np.where(np.logical_and(sw_amp > min_amp,
-                                           sw_amp < max_amp))[0]
-
-        good_dur = np.where(duration_ms > min_duration_ms)[0]
-        good_event = np.intersect1d(good_amp, good_dur, True)
-        good_idx = _events_removal(idx_start, idx_stop, good_event)
-        idx_sup_thr = idx_sup_thr[good_idx]
+        good_amp = np.logical_and(sw_amp > min_amp, sw_amp < max_amp)
+        good_dur = duration_ms > min_duration_ms
+        start, stop = _events_removal(start, stop, good_amp & good_dur)
 
         # Export info
-        number, duration_ms, _, _ = _events_duration(idx_sup_thr, sf)
+        number, duration_ms = _events_duration(start, stop, sf)
         density = number / (length / sf / 60.)
-        return idx_sup_thr, number, density, duration_ms
+        return _events_to_index(start, stop), number, density, duration_ms
 
     else:
         return np.array([], dtype=int), 0., 0., np.array([], dtype=int)
@@ -549,7 +536,7 @@ def mtdetect(elec, sf, threshold, hypno, rem_only, fMin=0, fMax=50,
     Sampling frequency must be at least 1000 Hz.
 
     Args:
-        elec: np.ndarray
+        elec: np.ndarray | DetectionContext
             EMG signal
 
         sf: float
@@ -608,61 +595,54 @@ def mtdetect(elec, sf, threshold, hypno, rem_only, fMin=0, fMax=50,
             Duration (ms) of each MT detected
 
     """
-    if rem_only and 4 in hypno:
-        elec[(np.where(hypno < 4))] = 0
+    # Only use REM sleep stage :
+    stages = 4 if rem_only and 4 in hypno else None
+    ctx = _detection_context(elec, sf, hypno)
+    elec = ctx.data(stages)
+    if stages is not None:
         length = np.count_nonzero(elec)
-        idx_zero = np.where(elec == 0)
     else:
         length = max(elec.shape)
 
     # Morlet's envelope
-    analytic = morlet(elec, sf, np.mean([fMin, fMax]))
-    amplitude = np.abs(analytic)
+    amplitude = ctx.envelope(np.mean([fMin, fMax]), stages)
     amplitude = movingaverage(amplitude, sf, sf)
 
     # Define threshold
-    if rem_only and 4 in hypno:
-        idTh = np.setdiff1d(np.arange(elec.size), idx_zero)
+    if stages is not None:
+        idTh = elec != 0
     else:
         # Remove period with too much delta power (N2 - N3)
-        delta_nfpow = welch_power(elec, 0.5, 2, sf, welch_win_s, norm=True)
+        delta_nfpow = ctx.welch_power(0.5, 2, welch_win_s, norm=True)
         delta_nfpow = np.repeat(delta_nfpow, welch_win_s * sf)
-        idTh = np.setdiff1d(np.arange(elec.size), np.where(
-                                                delta_nfpow > delta_thr)[0])
+        idTh = ~(delta_nfpow[:elec.size] > delta_thr)
 
     # Remove extreme values
-    idTh = np.setdiff1d(idTh, np.where(abs(elec) > 400)[0])
+    idTh &= ~(abs(elec) > 400)
 
     # Find supra-threshold values
     thresh = np.mean(amplitude[idTh]) + threshold * np.std(amplitude[idTh])
-    idx_sup_thr = np.where(amplitude > thresh)[0]
+    start, stop = _events_from_mask(amplitude > thresh)
 
-    if idx_sup_thr.size:
+    if start.size:
 
         # Find MTs separated by less than min_distance_ms
-        idx_sup_thr = _events_distance_fill(idx_sup_thr, min_distance_ms, sf)
-
-        _, _, idx_start, idx_stop = _events_duration(idx_sup_thr, sf)
+        start, stop = _events_distance_fill(start, stop, min_distance_ms, sf)
 
         # Amplitude criteria
-        mt_amp, _ = _event_amplitude(elec, idx_sup_thr, idx_start, idx_stop,
-                                     sf)
-        good_amp = np.where(np.logical_and(mt_amp > min_amp,
-                                           mt_amp < max_amp))[0]
-        good_idx = _events_removal(idx_start, idx_stop, good_amp)
+        mt_amp, _ = _event_amplitude(elec, start, stop, sf)
+        good_amp = np.logical_and(mt_amp > min_amp, mt_amp < max_amp)
 
         # Duration criteria
-        _, duration_ms, idx_start, idx_stop = _events_duration(idx_sup_thr, sf)
-        good_dur = np.where(np.logical_and(duration_ms > tMin,
-                                           duration_ms < tMax))[0]
-        good_idx = _events_removal(idx_start, idx_stop, good_dur)
+        _, duration_ms = _events_duration(start, stop, sf)
+        good_dur = np.logical_and(duration_ms > tMin, duration_ms < tMax)
 
         # Keep only good events
-        idx_sup_thr = idx_sup_thr[good_idx]
-        number, duration_ms, _, _ = _events_duration(idx_sup_thr, sf)
+        start, stop = _events_removal(start, stop, good_amp & good_dur)
+        number, duration_ms = _events_duration(start, stop, sf)
         density = number / (length / sf / 60.)
 
-        return idx_sup_thr, number, density, duration_ms
+        return _events_to_index(start, stop), number, density, duration_ms
 
     else:
         return np.array([], dtype=int), 0., 0., np.array([], dtype=int)
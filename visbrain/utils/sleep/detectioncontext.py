@@ -0,0 +1,319 @@
+"""Per-channel cache of the features shared by sleep detectors.
+
+Detectors of the same channel use the same transforms of the data (Morlet
+envelopes, band powers, filtered signals, Welch band powers...). A
+DetectionContext lazily computes these features and keeps them in memory so
+that running several detections on a channel computes each of them once.
+Features are identified by their parameters and stored in a FeatureMemory,
+which can be shared by the contexts of several channels. The least recently
+used features are dropped when the memory budget is exceeded.
+"""
+from collections import OrderedDict
+from itertools import count
+import numpy as np
+
+from ..filtering import filt, morlet_filterbank, welch_power
+from ..sigproc import tkeo
+
+__all__ = ['FeatureMemory', 'DetectionContext']
+
+
+class FeatureMemory(object):
+    """Memory budget shared by detection contexts.
+
+    Features of all contexts are dropped in least recently used order. The
+    data of the contexts are counted against the budget but are never
+    dropped.
+
+    Kargs:
+        max_bytes: int, optional, (def: 256 * 1024 ** 2)
+            Memory budget (in bytes).
+    """
+
+    def __init__(self, max_bytes=256 * 1024 ** 2):
+        """Init."""
+        self.max_bytes = int(max_bytes)
+        self._memo = OrderedDict()
+        self._owners = count()
+        # Bytes of features and of data owned by the contexts :
+        self.nbytes = 0
+        self.data_nbytes = 0
+
+    def __len__(self):
+        """Return the number of memoized features."""
+        return len(self._memo)
+
+    def _new_owner(self):
+        """Get a unique identifier for a context."""
+        return next(self._owners)
+
+    def keys(self, owner):
+        """Get the keys of the features of a context."""
+        return [k[1] for k in self._memo if k[0] == owner]
+
+    def __contains__(self, key):
+        """Test if a (owner, key) feature is memoized."""
+        return key in self._memo
+
+    def get(self, key):
+        """Get a (owner, key) feature and mark it as recently used."""
+        self._memo.move_to_end(key)
+        return self._memo[key]
+
+    def add(self, key, value):
+        """Add a (owner, key) feature and drop the least recently used ones.
+
+        The new feature is never dropped.
+        """
+        self._memo[key] = value
+        self.nbytes += value.nbytes
+        while (self.nbytes + self.data_nbytes > self.max_bytes) and (
+                len(self._memo) > 1):
+            self.nbytes -= self._memo.popitem(last=False)[1].nbytes
+
+    def pop(self, key):
+        """Drop a (owner, key) feature."""
+        self.nbytes -= self._memo.pop(key).nbytes
+
+
+class DetectionContext(object):
+    """Lazily computed and memoized features of a channel.
+
+    Features computed on a subset of sleep stages (the other samples being
+    set to zero) are dropped when the hypnogram changes.
+
+    Args:
+        channel_data: np.ndarray
+            Data vector of the channel.
+
+        sf: float
+            The sampling frequency.
+
+    Kargs:
+        hypno: np.ndarray, optional, (def: None)
+            Hypnogram vector, same length as channel_data.
+
+        max_bytes: int, optional, (def: 256 * 1024 ** 2)
+            Memory budget (in bytes) of the data and of the features of the
+            context. Ignored if memory is given.
+
+        memory: FeatureMemory, optional, (def: None)
+            Memory shared with the contexts of other channels.
+    """
+
+    def __init__(self, channel_data, sf, hypno=None,
+                 max_bytes=256 * 1024 ** 2, memory=None):
+        """Init."""
+        self._data = np.asarray(channel_data).ravel()
+        self.sf = float(sf)
+        self.hypno = None if hypno is None else np.array(hypno)
+        self.memory = FeatureMemory(max_bytes) if memory is None else memory
+        self._owner = self.memory._new_owner()
+        # The channel data is counted against the memory budget :
+        self._data_nbytes = self._data.nbytes
+        self.memory.data_nbytes += self._data_nbytes
+
+    def __len__(self):
+        """Return the number of memoized features."""
+        return len(self.memory.keys(self._owner))
+
+    def update_hypno(self, hypno):
+        """Update the hypnogram.
+
+        Args:
+            hypno: np.ndarray
+                Hypnogram vector, same length as channel_data.
+        """
+        if self.hypno is not None and np.array_equal(hypno, self.hypno):
+            return
+        self.hypno = np.array(hypno)
+        # Drop features that depend on the hypnogram :
+        for key in self.memory.keys(self._owner):
+            if key[-1] is not None:
+                self.memory.pop((self._owner, key))
+
+    def clear(self):
+        """Drop all memoized features."""
+        for key in self.memory.keys(self._owner):
+            self.memory.pop((self._owner, key))
+
+    def close(self):
+        """Drop all memoized features and release the data of the context.
+
+        The context must not be used afterwards.
+        """
+        self.clear()
+        self.memory.data_nbytes -= self._data_nbytes
+        self._data_nbytes = 0
+
+    def _in_memo(self, key):
+        """Test if a feature is memoized."""
+        return (self._owner, key) in self.memory
+
+    def _get(self, key, fcn, *args):
+        """Get a memoized feature (computed with fcn(*args) if needed)."""
+        if self._in_memo(key):
+            return self.memory.get((self._owner, key))
+        value = fcn(*args)
+        value.flags.writeable = False
+        self.memory.add((self._owner, key), value)
+        return value
+
+    def _stages(self, stages):
+        """Get a hashable version of sleep stages."""
+        return None if stages is None else tuple(
+            np.atleast_1d(stages).tolist())
+
+    def data(self, stages=None):
+        """Get the data of the channel.
+
+        Kargs:
+            stages: list, optional, (def: None)
+                Only keep the samples of these sleep stages (other samples
+                are set to zero).
+
+        Returns:
+            data: np.ndarray
+                The data vector.
+        """
+        stages = self._stages(stages)
+        if stages is None:
+            return self._data
+        return self._get(('data', stages), self._masked, stages)
+
+    def _masked(self, stages):
+        """Set samples outside of sleep stages to zero."""
+        data = self._data.copy()
+        data[~np.isin(self.hypno, stages)] = 0.
+        return data
+
+    def envelope(self, f, stages=None):
+        """Get the Morlet envelope(s) of the data.
+
+        Args:
+            f: float | array_like
+                Central frequency of the wavelet(s).
+
+        Kargs:
+            stages: list, optional, (def: None)
+                Only use the samples of these sleep stages.
+
+        Returns:
+            env: np.ndarray
+                Envelope of shape (N,) or (n_f, N) if several frequencies
+                are given.
+        """
+        stages = self._stages(stages)
+        freqs = [float(k) for k in np.atleast_1d(f)]
+        # Memoized envelopes (kept here in case they are evicted below) :
+        env = {k: self._get(('envelope', k, stages), None) for k in freqs
+               if self._in_memo(('envelope', k, stages))}
+        # Compute all missing envelopes at once :
+        missing = [k for k in freqs if k not in env]
+        if missing:
+            xenv = morlet_filterbank(self.data(stages), self.sf, missing,
+                                     get='amplitude')
+            for k, e in zip(missing, xenv):
+                env[k] = self._get(('envelope', k, stages), np.copy, e)
+        env = [env[k] for k in freqs]
+        return env[0] if np.isscalar(f) else np.array(env)
+
+    def morlet_power(self, freqs, norm=True, stages=None):
+        """Get the Morlet power of the data in successive frequency bands.
+
+        Args:
+            freqs: np.array
+                Frequency bands for power computation (see
+                visbrain.utils.morlet_power).
+
+        Kargs:
+            norm: boolean, optional (def True)
+                If True, return bandwise normalized band power.
+
+            stages: list, optional, (def: None)
+                Only use the samples of these sleep stages.
+
+        Returns:
+            xpow: np.ndarray
+                The power in the specified frequency bands of shape
+                (len(freqs)-1, npts).
+        """
+        f = np.c_[freqs[0:-1], freqs[1::]].mean(1)
+        xpow = np.power(self.envelope(f, stages), 2)
+        if norm:
+            np.divide(xpow, xpow.sum(0).reshape(1, -1), out=xpow)
+        return xpow
+
+    def filt(self, f, order=3, stages=None):
+        """Get the bandpass filtered data.
+
+        Args:
+            f: np.ndarray
+                Frequency vector (2,)
+
+        Kargs:
+            order: int, optional, (def: 3)
+                The filter order.
+
+            stages: list, optional, (def: None)
+                Only use the samples of these sleep stages.
+
+        Returns:
+            x: np.ndarray
+                The filtered data.
+        """
+        stages = self._stages(stages)
+        key = ('filt', tuple(float(k) for k in f), order, stages)
+        return self._get(key, lambda: filt(self.sf, np.asarray(f),
+                                           self.data(stages), order=order))
+
+    def tkeo(self, f, order=3, stages=None):
+        """Get the Teager-Kaiser energy of the bandpass filtered data.
+
+        Args:
+            f: np.ndarray
+                Frequency vector (2,)
+
+        Kargs:
+            order: int, optional, (def: 3)
+                The filter order.
+
+            stages: list, optional, (def: None)
+                Only use the samples of these sleep stages.
+
+        Returns:
+            x: np.ndarray
+                The TKEO of the filtered data (of length N - 2).
+        """
+        stages = self._stages(stages)
+        key = ('tkeo', tuple(float(k) for k in f), order, stages)
+        return self._get(key, lambda: tkeo(self.filt(f, order, stages)))
+
+    def welch_power(self, fMin, fMax, window_s=30, norm=True, stages=None):
+        """Get the Welch band power of the data.
+
+        Args:
+            fMin: float
+                Lower frequency of the band.
+
+            fMax: float
+                Upper frequency of the band.
+
+        Kargs:
+            window_s: int, optional (def 30)
+                Time resolution (sec) of Welch's periodogram.
+
+            norm: boolean, optional (def True)
+                If True, return normalized band power
+
+            stages: list, optional, (def: None)
+                Only use the samples of these sleep stages.
+
+        Returns:
+            power: np.ndarray
+                The (normalized) mean power of each window.
+        """
+        stages = self._stages(stages)
+        key = ('welch', float(fMin), float(fMax), window_s, norm, stages)
+        return self._get(key, lambda: welch_power(
+            self.data(stages), fMin, fMax, self.sf, window_s, norm))
@@ -13,7 +13,8 @@ from logging import getLogger
 from datetime import datetime
 from math import floor
 from re import findall
-from numpy import empty, asarray, fromstring, iinfo, abs, max
+from numpy import (empty, asarray, iinfo, abs, max, memmap, arange, cumsum,
+                   newaxis, float32, subtract, multiply, add, ndim)
 
 
 lg = getLogger(__name__)
@@ -138,16 +139,37 @@ class Edf:
 
         return subj_id, start_time, s_freq, chan_name, n_samples, self.hdr
 
+    def _read_rec(self):
+        """Memory-map the data section of the EDF file.
+
+        Returns
+        -------
+        numpy.memmap
+            A read-only (n_records, n_samples_per_all_channels) view of the
+            raw 16-bit samples. Each row is one data record and channels are
+            stored as contiguous segments within a row.
+        """
+        n_sam_rec = self.hdr['n_samples_per_record']
+        return memmap(self.filename, dtype='<i2', mode='r',
+                      offset=self.hdr['header_n_bytes'],
+                      shape=(self.hdr['n_records'], sum(n_sam_rec)))
+
+    def _chan_index(self, chan):
+        """Convert channel names or indices into a list of indices."""
+        return [self.hdr['label'].index(k) if isinstance(k, str) else int(k)
+                for k in chan]
+
     def _read_dat(self, i_chan, begsam, endsam):
-        """Read raw data from a single EDF channel.
+        """Read raw data from EDF channels.
 
-        Reads only one channel at the time. Very initial implementation, very
-        simple and probably not very fast
+        All the selected channels are sliced at once from the memory-mapped
+        data records. Channels must share the same number of samples per
+        record.
 
         Parameters
         ----------
-        i_chan : int
-            index of the channel to read
+        i_chan : int | list of int
+            index (indices) of the channel(s) to read
         begsam : int
             index of the first sample
         endsam : int
@@ -156,63 +178,56 @@ class Edf:
         Returns
         -------
         numpy.ndarray
-            A vector with the data as written on file, in 16-bit precision
+            A (n_channels, n_samples) matrix (or a vector if i_chan is an
+            int) with the data as written on file, in 16-bit precision
         """
         assert begsam < endsam
 
-        begsam = float(begsam)
-        endsam = float(endsam)
+        is_int = ndim(i_chan) == 0
+        i_chan = asarray([i_chan] if is_int else i_chan, dtype=int)
 
-        n_sam_rec = self.hdr['n_samples_per_record']
-
-        begrec = int(floor(begsam / n_sam_rec[i_chan]))
-        begsam_rec = int(begsam % n_sam_rec[i_chan])
-
-        endrec = int(floor(endsam / n_sam_rec[i_chan]))
-        endsam_rec = int(endsam % n_sam_rec[i_chan])
-
-        dat = empty(shape=(int(endsam) - int(begsam)), dtype='int16')
-        i_dat = 0
-
-        with open(self.filename, 'rb') as f:
-            for rec in range(begrec, endrec + 1):
-                if rec == begrec:
-                    begpos_rec = begsam_rec
-                else:
-                    begpos_rec = 0
+        n_sam_rec = asarray(self.hdr['n_samples_per_record'])
+        n_sam = n_sam_rec[i_chan]
+        if any(n_sam != n_sam[0]):
+            raise ValueError("Channels with different number of samples per "
+                             "record can not be read together.")
+        n_sam = int(n_sam[0])
 
-                if rec == endrec:
-                    endpos_rec = endsam_rec
-                else:
-                    endpos_rec = n_sam_rec[i_chan]
+        begsam, endsam = int(begsam), int(endsam)
+        begrec = int(floor(begsam / n_sam))
+        endrec = int(floor((endsam - 1) / n_sam)) + 1
 
-                begpos = begpos_rec + sum(n_sam_rec) * rec + sum(
-                    n_sam_rec[:i_chan])
-                endpos = endpos_rec + sum(n_sam_rec) * rec + sum(
-                    n_sam_rec[:i_chan])
+        # Column indices of each channel segment within a record :
+        chan_offset = cumsum(n_sam_rec) - n_sam_rec
+        cols = (chan_offset[i_chan][:, newaxis] + arange(n_sam)).ravel()
 
-                f.seek(begpos * 2 + self.hdr['header_n_bytes'])
-                samples = f.read(2 * (endpos - begpos))
+        # (n_rec, n_chan * n_sam) -> (n_chan, n_rec * n_sam) :
+        rec = self._read_rec()[begrec:endrec, cols]
+        dat = rec.reshape(endrec - begrec, len(i_chan), n_sam).transpose(
+            1, 0, 2).reshape(len(i_chan), -1)
 
-                i_dat_end = i_dat + endpos - begpos
-                dat[i_dat:i_dat_end] = fromstring(samples, dtype='<i2')
-                i_dat = i_dat_end
+        first = begsam - begrec * n_sam
+        dat = dat[:, first:first + endsam - begsam]
 
-        return dat
+        return dat[0, :] if is_int else dat
 
-    def return_dat(self, chan, begsam, endsam):
+    def return_dat(self, chan, begsam, endsam, out=None):
         """Read data from an EDF file.
 
-        Reads channel by channel, and adjusts the values by calibration.
+        Reads all the channels in one pass, and adjusts the values by
+        calibration.
 
         Parameters
         ----------
-        chan : list of str
-            index (indices) of the channels to read
+        chan : list of str | list of int
+            names or index (indices) of the channels to read
         begsam : int
             index of the first sample
         endsam : int
             index of the last sample
+        out : numpy.ndarray | None
+            A preallocated (n_channels, n_samples) array in which the
+            calibrated data are written. If None, a float32 array is created.
 
         Returns
         -------
@@ -221,23 +236,26 @@ class Edf:
             second dimension are the samples.
         """
         hdr = self.hdr
-        dig_min = hdr['digital_min']
-        phys_min = hdr['physical_min']
+        chan = self._chan_index(chan)
+        dig_min = hdr['digital_min'][chan, newaxis]
+        phys_min = hdr['physical_min'][chan, newaxis]
         phys_range = hdr['physical_max'] - hdr['physical_min']
         dig_range = hdr['digital_max'] - hdr['digital_min']
 
         # assert all(phys_range > 0)
         # assert all(dig_range > 0)
 
-        gain = phys_range / dig_range
+        gain = (phys_range / dig_range)[chan, newaxis]
 
-        dat = empty(shape=(len(chan), endsam - begsam), dtype='float64')
+        if out is None:
+            out = empty(shape=(len(chan), endsam - begsam), dtype=float32)
 
-        for i, i_chan in enumerate(chan):
-            d = self._read_dat(i, begsam, endsam).astype('float64')
-            dat[i, :] = (d - dig_min[i]) * gain[i] + phys_min[i]
+        d = self._read_dat(chan, begsam, endsam)
+        subtract(d, dig_min, out=out, casting='unsafe')
+        multiply(out, gain, out=out, casting='unsafe')
+        add(out, phys_min, out=out, casting='unsafe')
 
-        return dat
+        return out
 
     def return_markers(self):
         """"""
@@ -0,0 +1,123 @@
+"""Recording source of European Data Format (*.edf) files.
+
+This module is only imported when a file of this format is opened (see the
+sleep reader registry of visbrain.io).
+"""
+import os
+import numpy as np
+
+from .recording import RecordingSource, _antialias_filter
+
+__all__ = ['EdfSource']
+
+
+class EdfSource(RecordingSource):
+    """Read European Data Format (EDF) file.
+
+    Use phypno class for reading EDF files:
+        http: // phypno.readthedocs.io / api / phypno.ioeeg.edf.html
+
+    Channels can have different sampling rates. The source uses the highest
+    rate and channels recorded at a lower rate are kept at their native rate
+    on disk : each window is directly resampled (anti-aliased and linearly
+    interpolated) at the down-sampled rate.
+
+    Args:
+        path: str
+            Filename(with full path) to EDF file
+
+    Kargs:
+        downsample: float, optional, (def: None)
+            The downsampling frequency.
+
+        channels: list, optional, (def: None)
+            List of channel names (or indices) to read.
+    """
+
+    def __init__(self, path, downsample=None, channels=None):
+        """Init."""
+        assert os.path.isfile(path)
+
+        from .edf import Edf
+
+        edf = Edf(path)
+
+        # Return header informations
+        _, start_time, _, chan, _, _ = edf.return_hdr()
+        start_time = start_time.time()
+
+        # Keep only data channels (e.g excludes annotations chan)
+        n_sam_rec = np.asarray(edf.hdr['n_samples_per_record'])
+        idx_chan = np.array([k for k, c in enumerate(chan) if
+                             c != 'EDF Annotations'], dtype=int)
+        chan = [chan[k] for k in idx_chan]
+        n_max = n_sam_rec[idx_chan].max()
+        sf = n_max / edf.hdr['record_length']
+        n_samples = n_max * edf.hdr['n_records']
+
+        self.path = path
+        self._edf = edf
+        self._idx_chan = idx_chan
+        # Native number of samples per record of each channel :
+        self._n_sam_rec = n_sam_rec[idx_chan]
+
+        RecordingSource.__init__(self, sf, chan, n_samples, start_time,
+                                 downsample, channels)
+
+    @property
+    def sfs(self):
+        """Get the native sampling frequency of each channel."""
+        return self._n_sam_rec[self._picks] / self._edf.hdr['record_length']
+
+    def _read(self, idx, start, stop, out=None):
+        """Read calibrated samples of the selected channels."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self._edf.return_dat(self._idx_chan[idx], start, stop,
+                                        out=out)
+
+    def _read_window(self, idx, start, stop, out):
+        """Read full rate channels and resample lower rate channels."""
+        n_sam = self._n_sam_rec[idx]
+        for n in np.unique(n_sam):
+            rows = np.where(n_sam == n)[0]
+            if n == self._n_sam_rec.max():
+                dat = np.empty((len(rows), stop - start), dtype=np.float32)
+                RecordingSource._read_window(self, idx[rows], start, stop,
+                                             dat)
+            else:
+                dat = self._resample_chunks(idx[rows], n, start, stop)
+            out[rows, :] = dat
+
+    def _resample_chunks(self, idx, n_sam, start, stop):
+        """Resample lower rate channels at the down-sampled rate.
+
+        Native samples are read chunk by chunk, low-pass filtered if the
+        native rate is higher than the down-sampled one and linearly
+        interpolated at the down-sampled time points.
+        """
+        from scipy.ndimage import convolve1d
+
+        ratio = n_sam / self._n_sam_rec.max()
+        n_nat = int(n_sam * self._edf.hdr['n_records'])
+        q = ratio * self.ds
+        h = _antialias_filter(int(np.ceil(q))) if q > 1 else None
+        m = 0 if h is None else (len(h) - 1) // 2
+        out = np.empty((len(idx), stop - start), dtype=np.float32)
+        step = max(self.chunk // self.ds, 1)
+        for k in range(start, stop, step):
+            # Fractional native position of each down-sampled point :
+            pos = np.arange(k, min(k + step, stop)) * q
+            first = np.floor(pos).astype(int)
+            beg, end = first[0] - m, first[-1] + m + 2
+            # Read native samples (out of bounds samples are repeated) :
+            rbeg = min(max(beg, 0), n_nat - 1)
+            rend = max(min(end, n_nat), rbeg + 1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                x = self._edf.return_dat(self._idx_chan[idx], rbeg, rend)
+            x = x[:, np.clip(np.arange(beg, end), rbeg, rend - 1) - rbeg]
+            if h is not None:
+                x = convolve1d(x, h, axis=1, mode='nearest')
+            i0, frac = first - beg, (pos - first).astype(np.float32)
+            out[:, k - start:k - start + len(pos)] = x[:, i0] * (
+                1 - frac) + x[:, i0 + 1] * frac
+        return out
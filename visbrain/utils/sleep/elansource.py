@@ -0,0 +1,103 @@
+"""Recording source of ELAN (*.eeg + *.eeg.ent) files.
+
+This module is only imported when a file of this format is opened (see the
+sleep reader registry of visbrain.io).
+"""
+import os
+import datetime
+import numpy as np
+
+from .recording import RecordingSource
+
+__all__ = ['ElanSource']
+
+
+class ElanSource(RecordingSource):
+    """Read Elan eeg file.
+
+    Elan format specs: http: // elan.lyon.inserm.fr/
+
+    Args:
+        path: str
+            Filename(with full path) to Elan .eeg file
+
+    Kargs:
+        downsample: float, optional, (def: None)
+            The downsampling frequency.
+
+        channels: list, optional, (def: None)
+            List of channel names (or indices) to read.
+    """
+
+    def __init__(self, path, downsample=None, channels=None):
+        """Init."""
+        header = path + '.ent'
+
+        assert os.path.isfile(path)
+        assert os.path.isfile(header)
+
+        # Read .ent file
+        ent = np.genfromtxt(header, delimiter='\n', usecols=[0],
+                            dtype=None, skip_header=0)
+
+        ent = np.char.decode(ent)
+
+        # eeg file version
+        eeg_version = ent[0]
+
+        if eeg_version == 'V2':
+            nb_oct = 2
+            formread = '>i2'
+        elif eeg_version == 'V3':
+            nb_oct = 4
+            formread = '>i4'
+
+        # Sampling rate
+        sf = 1. / float(ent[8])
+
+        # Record starting time
+        if ent[4] != "No time":
+            hour, minutes, sec = ent[4].split(':')
+            start_time = datetime.time(int(hour), int(minutes), int(sec))
+        else:
+            start_time = datetime.time(0, 0, 0)
+
+        # Channels
+        nb_chan = int(ent[9])
+
+        # Last 2 channels do not contain data
+        nb_chan_data = nb_chan - 2
+        chan = ent[10:10 + nb_chan_data]
+
+        # Gain
+        gain = np.zeros(nb_chan)
+        offset1 = 9 + 3 * nb_chan
+        offset2 = 9 + 4 * nb_chan
+        offset3 = 9 + 5 * nb_chan
+        offset4 = 9 + 6 * nb_chan
+
+        for i in np.arange(1, nb_chan + 1):
+
+            MinAn = float(ent[offset1 + i])
+            MaxAn = float(ent[offset2 + i])
+            MinNum = float(ent[offset3 + i])
+            MaxNum = float(ent[offset4 + i])
+
+            gain[i - 1] = (MaxAn - MinAn) / (MaxNum - MinNum)
+
+        # Load memmap
+        nb_bytes = os.path.getsize(path)
+        nb_samples = int(nb_bytes / (nb_oct * nb_chan))
+
+        self.path = path
+        self._raw = np.memmap(path, dtype=formread, mode='r',
+                              shape=(nb_chan, nb_samples), order='F')
+        self._gain = gain[0:nb_chan_data, np.newaxis].astype(np.float32)
+
+        RecordingSource.__init__(self, sf, chan, nb_samples, start_time,
+                                 downsample, channels)
+
+    def _read(self, idx, start, stop, out=None):
+        """Read and multiply by gain."""
+        return np.multiply(self._raw[idx, start:stop], self._gain[idx, :],
+                           out=out, dtype=np.float32)
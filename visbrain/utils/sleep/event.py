@@ -1,18 +1,90 @@
-"""Goup of functions for index / event managment."""
+"""Goup of functions for index / event managment.
+
+Events are represented by two int arrays (start, stop) of the first and last
+samples of each event (the stop sample is included in the event). Functions
+below work on these arrays and therefore scale with the number of events
+rather than with the number of supra-threshold samples.
+"""
 
 import numpy as np
 from scipy.signal import hilbert
 
-__all__ = ['_events_duration', '_events_removal', '_events_distance_fill',
-           '_events_mean_freq', '_event_to_index', '_index_to_event']
+__all__ = ['_events_from_mask', '_events_from_index', '_events_to_index',
+           '_events_duration', '_events_removal', '_events_distance_fill',
+           '_events_overlap', '_events_reduce', '_events_mean_freq',
+           '_event_amplitude', '_event_to_index', '_index_to_event']
+
+
+def _events_from_mask(mask):
+    """Get events from a boolean vector.
+
+    Args:
+        mask: np.ndarray
+            Boolean vector (True where the signal is supra-threshold).
+
+    Returns:
+        start: np.ndarray
+            First sample of each event.
+
+        stop: np.ndarray
+            Last sample of each event.
+    """
+    edges = np.diff(np.r_[0, np.asarray(mask, dtype=np.int8), 0])
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1) - 1
 
 
-def _events_duration(index, sf):
-    """Compute spindles/REM duration in ms.
+def _events_from_index(index):
+    """Get events from a sorted vector of indices.
 
     Args:
         index: np.ndarray
-            Index of events locations.
+            Sorted vector of supra-threshold indices.
+
+    Returns:
+        start: np.ndarray
+            First sample of each event.
+
+        stop: np.ndarray
+            Last sample of each event.
+    """
+    index = np.asarray(index, dtype=int).ravel()
+    if not index.size:
+        return index, index
+    # Find where each event break :
+    brk = np.flatnonzero(np.diff(index) != 1)
+    return index[np.r_[0, brk + 1]], index[np.r_[brk, index.size - 1]]
+
+
+def _events_to_index(start, stop):
+    """Get the vector of indices covered by events.
+
+    Args:
+        start: np.ndarray
+            First sample of each event.
+
+        stop: np.ndarray
+            Last sample of each event.
+
+    Returns:
+        index: np.ndarray
+            Continuous vector of indices.
+    """
+    start, stop = np.asarray(start, dtype=int), np.asarray(stop, dtype=int)
+    lengths = stop - start + 1
+    # Shift a global arange by the offset of each event :
+    first = np.cumsum(lengths) - lengths
+    return np.arange(lengths.sum()) + np.repeat(start - first, lengths)
+
+
+def _events_duration(start, stop, sf):
+    """Compute events duration in ms.
+
+    Args:
+        start: np.ndarray
+            First sample of each event.
+
+        stop: np.ndarray
+            Last sample of each event.
 
         sf: float
             The sampling frequency.
@@ -23,63 +95,42 @@ def _events_duration(index, sf):
 
         duration_ms: np.ndarray
             Duration of each event
-
-        idx_start: np.ndarray
-            Array of integers where each event begin.
-
-        idx_end: np.ndarray
-            Array of integers where each event finish.
     """
-    # Find boolean values where each spindle start :
-    bool_break = (index[1:] - index[:-1]) != 1
-    # Get event number :
-    number = bool_break.sum() + 1
-    # Build starting / ending spindles index :
-    idx_start = np.hstack([np.array([0]), np.where(bool_break)[0] + 1])
-    idx_stop = np.hstack((idx_start[1::], len(index)-1))
-    # Compute duration :
-    duration_ms = np.diff(np.hstack((idx_start, idx_stop[-1]))) * (1000. / sf)
+    return len(start), (stop - start + 1) * (1000. / sf)
 
-    return number, duration_ms, idx_start, idx_stop
 
-
-def _events_removal(idx_start, idx_stop, good_dur):
+def _events_removal(start, stop, good):
     """Remove events that do not have the good duration.
 
     Args:
-        idx_start: np.ndarray
-            Starting indices of event.
+        start: np.ndarray
+            First sample of each event.
 
-        idx_stop: np.ndarray
-            Ending indices of event.
+        stop: np.ndarray
+            Last sample of each event.
 
-        good_dur: np.ndarray
-            Indices of event having a proper duration.
+        good: np.ndarray
+            Boolean vector (or indices) of events to keep.
 
     Return:
-        good_idx: np.ndarray
-            Row vector containing the extending version of indices.
-    """
-    # Get where good duration start / end :
-    start = idx_start[good_dur]
-    stop = idx_stop[good_dur]
+        start: np.ndarray
+            First sample of kept events.
 
-    # Extend each spindle duration (start -> stop) :
-    extend = np.array([np.arange(i, j) for i, j in zip(start, stop)])
-
-    # Get it as a flatten array :
-    if extend.size:
-        return np.hstack(extend.flat)
-    else:
-        return np.array([], dtype=int)
+        stop: np.ndarray
+            Last sample of kept events.
+    """
+    return start[good], stop[good]
 
 
-def _events_distance_fill(index, min_distance_ms, sf):
-    """Remove events that do not have the good duration.
+def _events_distance_fill(start, stop, min_distance_ms, sf):
+    """Merge events that are too close.
 
     Args:
-        index: np.ndarray
-            Indices of supra-threshold events.
+        start: np.ndarray
+            First sample of each event.
+
+        stop: np.ndarray
+            Last sample of each event.
 
         min_distance_ms: int
             Minimum distance (ms) between two events to consider them as two
@@ -89,38 +140,90 @@ def _events_distance_fill(index, min_distance_ms, sf):
             Sampling frequency of the data (Hz)
 
     Return:
-        f_index: np.ndarray
-            Filled (corrected) Indices of supra-threshold events
+        start: np.ndarray
+            First sample of merged events.
+
+        stop: np.ndarray
+            Last sample of merged events.
     """
+    if not len(start):
+        return start, stop
     # Convert min_distance_ms
     min_distance = min_distance_ms / 1000. * sf
-    idx_diff = np.diff(index)
-    condition = idx_diff > 1
-    idx_distance = np.where(condition)[0]
-    distance = idx_diff[condition]
-    bad = idx_distance[np.where(distance < min_distance)[0]]
-    # Fill gap between events separated with less than min_distance_ms
-    if len(bad) > 0:
-        fill = np.hstack([np.arange(index[j] + 1, index[j + 1])
-                          for i, j in enumerate(bad)])
-        f_index = np.sort(np.append(index, fill))
-        return f_index
-    else:
-        return index
+    # Keep gaps larger than min_distance :
+    keep = (start[1:] - stop[:-1]) >= min_distance
+    return start[np.r_[True, keep]], stop[np.r_[keep, True]]
 
 
-def _events_mean_freq(x, idx_sup_thr, idx_start, idx_stop, sf):
-    """Remove events that do not have the good duration.
+def _events_overlap(lo, hi, start, stop):
+    """Test if windows overlap sorted events.
+
+    Args:
+        lo: np.ndarray
+            First sample of each window.
+
+        hi: np.ndarray
+            Last sample (excluded) of each window.
+
+        start: np.ndarray
+            First sample of each event (sorted, non-overlapping events).
+
+        stop: np.ndarray
+            Last sample of each event.
+
+    Return:
+        overlap: np.ndarray
+            Boolean vector (True if the window contains at least one sample
+            of an event).
+    """
+    # First event that does not end before the window :
+    idx = np.searchsorted(stop, lo, 'left')
+    overlap = idx < len(start)
+    overlap[overlap] = start[idx[overlap]] < hi[overlap]
+    return overlap
+
+
+def _events_reduce(x, start, stop, ufunc=np.maximum):
+    """Reduce the samples of each event.
 
     Args:
-        idx_sup_thr: np.ndarray
-                Vector of supra-threshold events
+        x: np.ndarray
+            Data vector.
 
-        idx_start: np.ndarray
-            Starting indices of event.
+        start: np.ndarray
+            First sample of each event.
 
-        idx_stop: np.ndarray
-            Ending indices of event.
+        stop: np.ndarray
+            Last sample of each event.
+
+    Kargs:
+        ufunc: np.ufunc, optional, (def: np.maximum)
+            The reduction to apply (e.g np.maximum, np.minimum, np.add).
+
+    Return:
+        red: np.ndarray
+            Reduced value of each event.
+    """
+    if not len(start):
+        return np.array([], dtype=x.dtype)
+    lengths = stop - start + 1
+    # Events are gathered end to end and reduced from their first sample :
+    first = np.cumsum(lengths) - lengths
+    return ufunc.reduceat(x[_events_to_index(start, stop)], first)
+
+
+def _events_mean_freq(x, start, stop, sf):
+    """Compute the mean instantaneous frequency of each event.
+
+    Args:
+        x: np.ndarray
+            Data vector.
+
+        start: np.ndarray
+            First sample of each event.
+
+        stop: np.ndarray
+            Last sample of each event.
 
         sf: int
             Sampling frequency of the data (Hz)
@@ -134,54 +237,48 @@ def _events_mean_freq(x, idx_sup_thr, idx_start, idx_stop, sf):
     else:
         analytic = hilbert(x[:-1], len(x))
     phase = np.unwrap(np.angle(analytic))
-    inst_freq = abs(np.diff(phase) / (2.0 * np.pi) * sf)
-    mfreq = np.array([])
-    # Loop on each event
-    for i, j in zip(idx_start, idx_stop):
-        idx_event = np.arange(idx_sup_thr[i], idx_sup_thr[j])
-        mfreq = np.append(mfreq, np.mean(inst_freq[idx_event]))
+    inst_freq = np.abs(np.diff(phase) / (2.0 * np.pi) * sf)
+    inst_freq = np.r_[inst_freq, inst_freq[-1:]]
+    return _events_reduce(inst_freq, start, stop, np.add) / (stop - start + 1)
 
-    return mfreq
 
+def _event_amplitude(x, start, stop, sf):
+    """Find amplitude range of events.
 
-def _event_amplitude(x, idx_sup_thr, idx_start, idx_stop, sf):
-        """Find amplitude range of events.
-
-        Args:
-            idx_sup_thr: np.ndarray
-                Vector of supra-threshold events
-
-            idx_start: np.ndarray
-                Starting indices of event.
+    Args:
+        x: np.ndarray
+            Data vector.
 
-            idx_stop: np.ndarray
-                Ending indices of event.
+        start: np.ndarray
+            First sample of each event.
 
-            sf: int
-                Sampling frequency of the data (Hz)
+        stop: np.ndarray
+            Last sample of each event.
 
-        Return:
-            amp_range: np.ndarray
-                Amplitude range (max - min) of each event
+        sf: int
+            Sampling frequency of the data (Hz)
 
-            distance_ms: np.ndarray
-                Distance (ms) between min and max
-        """
-        amp_range = np.array([])
-        distance_ms = np.array([])
-        # Loop on each event
-        for i, j in zip(idx_start, idx_stop):
-            idx_event = np.arange(idx_sup_thr[i], idx_sup_thr[j])
-            if idx_event.size > 0:
-                amp_range = np.append(amp_range, np.ptp(x[idx_event]))
-                distance = np.abs(np.argmax(x[idx_event]) - np.argmin(
-                                                              x[idx_event]))
-                distance_ms = np.append(distance_ms, distance / sf * 1000)
-            else:
-                amp_range = 0.
-                distance_ms = 0.
+    Return:
+        amp_range: np.ndarray
+            Amplitude range (max - min) of each event
 
-        return amp_range, distance_ms
+        distance_ms: np.ndarray
+            Distance (ms) between min and max
+    """
+    if not len(start):
+        return np.array([]), np.array([])
+    lengths = stop - start + 1
+    index = _events_to_index(start, stop)
+    first = np.cumsum(lengths) - lengths
+    val = x[index]
+    vmax = np.maximum.reduceat(val, first)
+    vmin = np.minimum.reduceat(val, first)
+    # Sample of the first maximum / minimum of each event :
+    imax = np.minimum.reduceat(np.where(val == np.repeat(vmax, lengths),
+                                        index, x.size), first)
+    imin = np.minimum.reduceat(np.where(val == np.repeat(vmin, lengths),
+                                        index, x.size), first)
+    return vmax - vmin, np.abs(imax - imin) / sf * 1000
 
 
 def _event_to_index(x):
@@ -196,10 +293,7 @@ def _event_to_index(x):
             An array of shape (n_events, 2) where the dimension 2 refer to the
             indices where each event start and finish.
     """
-    # Split indices where it stopped :
-    sp = np.split(x, np.where(np.diff(x) != 1)[0]+1)
-    # Return (start, end) :
-    return np.array([[k[0], k[-1]] for k in sp]).astype(int)
+    return np.c_[_events_from_index(x)].astype(int)
 
 
 def _index_to_event(x):
@@ -213,7 +307,4 @@ def _index_to_event(x):
         index: np.ndarray
             Continuous array of indicies.
     """
-    index = np.array([])
-    for k in range(x.shape[0]):
-        index = np.append(index, np.arange(x[k, 0], x[k, 1]+1))
-    return index.astype(int)
+    return _events_to_index(x[:, 0], x[:, 1])
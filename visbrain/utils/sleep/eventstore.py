@@ -0,0 +1,186 @@
+"""Columnar store of detected events.
+
+Events are stored in a structured array (one row per event) containing the
+channel id, the type id, the starting and ending samples and optional float
+features (e.g amplitude, frequency, stage). Rows are kept sorted by starting
+sample so that time-range queries only require a binary search.
+"""
+import numpy as np
+
+__all__ = ['EventTable']
+
+
+class EventTable(object):
+    """Table of detected events sorted by starting sample.
+
+    Args:
+        channels: list
+            List of channel names (events refer to channels by index).
+
+        types: list
+            List of event type names (e.g 'Spindles', 'REM'...).
+
+    Kargs:
+        sf: float, optional, (def: 1.)
+            The sampling frequency of start / stop samples.
+
+        features: list, optional, (def: ())
+            Names of optional per-event float features (e.g 'amplitude',
+            'frequency', 'stage').
+    """
+
+    def __init__(self, channels, types, sf=1., features=()):
+        """Init."""
+        self.channels = [str(k) for k in channels]
+        self.types = [str(k) for k in types]
+        self.sf = float(sf)
+        self.features = tuple(features)
+        dtype = [('channel', np.int16), ('type', np.int8),
+                 ('start', np.int64), ('stop', np.int64)]
+        dtype += [(k, np.float32) for k in self.features]
+        self.events = np.zeros((0,), dtype=dtype)
+        # Longest event (used to bound overlap queries) :
+        self._maxdur = 0
+
+    def __len__(self):
+        """Return the number of events."""
+        return len(self.events)
+
+    def _id(self, names, value):
+        """Get the index of a channel / type name."""
+        return value if isinstance(value, (int, np.integer)) else \
+            names.index(value)
+
+    def append(self, channel, types, index, **features):
+        """Merge new events into the table.
+
+        Args:
+            channel: str | int
+                Channel name (or index).
+
+            types: str | int
+                Event type name (or index).
+
+            index: np.ndarray
+                Array of (start, stop) samples of shape (n_events, 2) (the
+                stop sample is included in the event).
+
+        Kargs:
+            features: np.ndarray
+                Per-event value of each feature of the table (missing
+                features are set to NaN).
+        """
+        index = np.asarray(index, dtype=np.int64).reshape(-1, 2)
+        new = np.zeros((index.shape[0],), dtype=self.events.dtype)
+        new['channel'] = self._id(self.channels, channel)
+        new['type'] = self._id(self.types, types)
+        new['start'], new['stop'] = index[:, 0], index[:, 1]
+        for k in self.features:
+            new[k] = features.get(k, np.nan)
+        if not new.size:
+            return
+        new = new[np.argsort(new['start'], kind='stable')]
+        # Insert new rows after existing rows with the same start :
+        pos = np.searchsorted(self.events['start'], new['start'], 'right')
+        self.events = np.insert(self.events, pos, new)
+        self._maxdur = max(self._maxdur, int((new['stop'] -
+                                              new['start']).max()))
+
+    def remove(self, channel, types):
+        """Remove all events of a channel and type.
+
+        Args:
+            channel: str | int
+                Channel name (or index).
+
+            types: str | int
+                Event type name (or index).
+        """
+        mask = (self.events['channel'] == self._id(self.channels, channel)) &\
+            (self.events['type'] == self._id(self.types, types))
+        self.events = self.events[~mask]
+
+    def query(self, start=None, stop=None, channel=None, types=None):
+        """Get events overlapping a time range.
+
+        Args:
+            start: int, optional, (def: None)
+                First sample of the range.
+
+            stop: int, optional, (def: None)
+                Last sample of the range (excluded).
+
+            channel: str | int, optional, (def: None)
+                Only get events of this channel.
+
+            types: str | int, optional, (def: None)
+                Only get events of this type.
+
+        Returns:
+            events: np.ndarray
+                Structured array of events sorted by starting sample.
+        """
+        starts = self.events['start']
+        lo = 0 if start is None else np.searchsorted(
+            starts, start - self._maxdur, 'left')
+        hi = len(self) if stop is None else np.searchsorted(starts, stop,
+                                                            'left')
+        ev = self.events[lo:hi]
+        mask = np.ones((len(ev),), dtype=bool)
+        if start is not None:
+            mask &= ev['stop'] >= start
+        if channel is not None:
+            mask &= ev['channel'] == self._id(self.channels, channel)
+        if types is not None:
+            mask &= ev['type'] == self._id(self.types, types)
+        return ev[mask]
+
+    def index(self, channel, types):
+        """Get the (start, stop) samples of a channel and type.
+
+        Args:
+            channel: str | int
+                Channel name (or index).
+
+            types: str | int
+                Event type name (or index).
+
+        Returns:
+            index: np.ndarray
+                Array of shape (n_events, 2).
+        """
+        ev = self.query(channel=channel, types=types)
+        return np.c_[ev['start'], ev['stop']]
+
+    def save(self, filename):
+        """Save the table into an uncompressed .npz file.
+
+        Args:
+            filename: str
+                Filename (with full path).
+        """
+        np.savez(filename, events=self.events, sf=self.sf,
+                 channels=np.array(self.channels, dtype=str),
+                 types=np.array(self.types, dtype=str),
+                 features=np.array(self.features, dtype=str))
+
+    @classmethod
+    def load(cls, filename):
+        """Load a table saved with the save() method.
+
+        Args:
+            filename: str
+                Filename (with full path).
+
+        Returns:
+            table: EventTable
+                The loaded table.
+        """
+        with np.load(filename, allow_pickle=False) as arch:
+            table = cls(arch['channels'], arch['types'], float(arch['sf']),
+                        [str(k) for k in arch['features']])
+            table.events = arch['events'].astype(table.events.dtype)
+        if len(table):
+            table._maxdur = int((table.events['stop'] -
+                                 table.events['start']).max())
+        return table
@@ -3,7 +3,171 @@
 import numpy as np
 from os import path
 
-__all__ = ['sleepstats', 'transient']
+__all__ = ['Hypnogram', 'sleepstats', 'transient']
+
+
+class Hypnogram(object):
+    """Compact hypnogram.
+
+    The hypnogram is stored as run-length segments (start, stop, stage) with
+    int8 stages. When the hypnogram is defined on regular epochs (e.g one
+    stage every 30 seconds), the per-epoch stages are also kept so that
+    looking for the stage at a given time is O(1). A per-sample vector is
+    only built when explicitly requested with the to_samples() method.
+
+    Args:
+        stages: array_like
+            Stage of each epoch.
+
+    Kargs:
+        epoch: float, optional, (def: 30.)
+            Length of an epoch (in seconds).
+
+        duration: float, optional, (def: None)
+            Duration of the hypnogram (in seconds). By default, the duration
+            is len(stages) * epoch.
+    """
+
+    def __init__(self, stages, epoch=30., duration=None):
+        """Init."""
+        stages = np.asarray(stages).astype(np.int8).ravel()
+        self.epoch = float(epoch)
+        self.duration = float(len(stages) * epoch if duration is None else
+                              duration)
+        self._epochs = stages
+        # Run-length segments :
+        idx = np.flatnonzero(np.r_[True, np.diff(stages) != 0][:len(stages)])
+        self._starts = idx * self.epoch
+        self._stages = stages[idx]
+
+    def __len__(self):
+        """Return the number of segments."""
+        return len(self._stages)
+
+    @classmethod
+    def from_segments(cls, starts, stops, stages):
+        """Build an hypnogram from (start, stop, stage) segments.
+
+        Args:
+            starts: array_like
+                Starting time of each segment (in seconds).
+
+            stops: array_like
+                Ending time of each segment (in seconds).
+
+            stages: array_like
+                Stage of each segment.
+
+        Returns:
+            hypno: Hypnogram
+                The hypnogram.
+        """
+        starts, stops = np.asarray(starts, float), np.asarray(stops, float)
+        stages = np.asarray(stages).astype(np.int8)
+        order = np.argsort(starts)
+        starts, stops, stages = starts[order], stops[order], stages[order]
+        if np.any(starts[1:] != stops[:-1]):
+            raise ValueError("Segments must be contiguous.")
+        hyp = cls([], duration=stops[-1] if len(stops) else 0.)
+        hyp.epoch, hyp._epochs = None, None
+        # Merge consecutive segments of the same stage :
+        keep = np.r_[True, stages[1:] != stages[:-1]]
+        hyp._starts, hyp._stages = starts[keep], stages[keep]
+        return hyp
+
+    @classmethod
+    def from_samples(cls, hypno, sf):
+        """Compress a per-sample hypnogram vector.
+
+        Args:
+            hypno: array_like
+                Per-sample hypnogram vector.
+
+            sf: float
+                The sampling frequency of the vector.
+
+        Returns:
+            hypno: Hypnogram
+                The hypnogram.
+        """
+        hypno = np.asarray(hypno).ravel()
+        idx = np.r_[0, np.flatnonzero(np.diff(hypno)) + 1]
+        return cls.from_segments(idx / sf, np.r_[idx[1:], len(hypno)] / sf,
+                                 hypno[idx])
+
+    def segments(self):
+        """Get the run-length segments.
+
+        Returns:
+            starts: np.ndarray
+                Starting time of each segment (in seconds).
+
+            stops: np.ndarray
+                Ending time of each segment (in seconds).
+
+            stages: np.ndarray
+                The int8 stage of each segment.
+        """
+        return (self._starts, np.r_[self._starts[1:], self.duration],
+                self._stages)
+
+    def stage_at(self, t):
+        """Get the stage at given time(s).
+
+        Args:
+            t: float | array_like
+                Time(s) (in seconds).
+
+        Returns:
+            stage: int | np.ndarray
+                The stage(s).
+        """
+        if self._epochs is not None:
+            idx = np.clip(np.floor_divide(t, self.epoch).astype(int), 0,
+                          len(self._epochs) - 1)
+            return self._epochs[idx]
+        idx = np.searchsorted(self._starts, t, side='right') - 1
+        return self._stages[np.clip(idx, 0, len(self) - 1)]
+
+    def to_epochs(self, epoch=30.):
+        """Get the stage at the beginning of each epoch.
+
+        Args:
+            epoch: float, optional, (def: 30.)
+                Length of an epoch (in seconds).
+
+        Returns:
+            stages: np.ndarray
+                The int8 stage of each epoch.
+        """
+        n = int(np.round(self.duration / epoch))
+        return self.stage_at(np.arange(n) * epoch)
+
+    def to_samples(self, sf, npts=None, dtype=np.float32):
+        """Get a per-sample hypnogram vector.
+
+        Args:
+            sf: float
+                The sampling frequency.
+
+        Kargs:
+            npts: int, optional, (def: None)
+                Number of samples. By default, the duration of the hypnogram
+                is used.
+
+            dtype: type, optional, (def: np.float32)
+                Data type of the vector.
+
+        Returns:
+            hypno: np.ndarray
+                Hypnogram vector of shape (npts,).
+        """
+        if npts is None:
+            npts = int(np.round(self.duration * sf))
+        # Number of samples of each segment :
+        bounds = np.clip(np.round(self._starts * sf).astype(int), 0, npts)
+        counts = np.diff(np.r_[bounds, npts])
+        return np.repeat(self._stages.astype(dtype), counts)
 
 
 def transient(data, xvec=None):
@@ -53,8 +217,8 @@ def sleepstats(file, hypno, N, sf=100., sfori=1000., time_window=30.):
         file: str
             Filename (with full path) to sleep dataset.
 
-        hypno: np.ndarray
-            Hypnogram vector
+        hypno: np.ndarray | Hypnogram
+            Hypnogram vector or compact hypnogram.
 
         N: int
             Original data shape before down-sampling.
@@ -102,9 +266,13 @@ def sleepstats(file, hypno, N, sf=100., sfori=1000., time_window=30.):
     ======================================================================
 
     """
-    # Get a step (integer) and resample to get one value per 30 seconds :
-    step = int(hypno.shape / np.round(N / (sfori * time_window)))
-    hypno = hypno[::step]
+    if isinstance(hypno, Hypnogram):
+        # One value per time window, directly from the segments :
+        hypno = hypno.to_epochs(time_window).astype(int)
+    else:
+        # Get a step (integer) and resample to get one value per 30 seconds :
+        step = int(hypno.shape[0] / np.round(N / (sfori * time_window)))
+        hypno = hypno[::step]
 
     stats = {}
     tov = np.nan
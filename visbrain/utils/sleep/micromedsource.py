@@ -0,0 +1,110 @@
+"""Recording source of Micromed (*.trc) files.
+
+This module is only imported when a file of this format is opened (see the
+sleep reader registry of visbrain.io).
+"""
+import os
+import datetime
+import numpy as np
+
+from .recording import RecordingSource
+
+__all__ = ['MicromedSource']
+
+
+class MicromedSource(RecordingSource):
+    """Read Micromed (*.trc) file version 4.
+
+    Poor man's version of micromedio.py from Neo package
+    (https://pythonhosted.org/neo/)
+
+    Args:
+        path: str
+            Filename(with full path) to .trc file
+
+    Kargs:
+        downsample: float, optional, (def: None)
+            The downsampling frequency.
+
+        channels: list, optional, (def: None)
+            List of channel names (or indices) to read.
+    """
+
+    def __init__(self, path, downsample=None, channels=None):
+        """Init."""
+        import struct
+
+        def read_f(f, fmt):
+            return struct.unpack(fmt, f.read(struct.calcsize(fmt)))
+
+        with open(path, 'rb') as f:
+            # Read header
+            f.seek(175, 0)
+            header_version, = read_f(f, 'b')
+            assert header_version == 4
+
+            f.seek(138, 0)
+            data_start_offset, n_chan, _, sf, nbytes = read_f(f, 'IHHHH')
+
+            f.seek(128, 0)
+            day, month, year, hour, minute, sec = read_f(f, 'bbbbbb')
+            start_time = datetime.time(hour, minute, sec)
+
+            # Read label / gain
+            gain = []
+            chan = []
+            logical_ground = []
+
+            f.seek(176, 0)
+            zone_names = ['ORDER', 'LABCOD']
+            zones = {}
+            for zname in zone_names:
+                zname2, pos, length = read_f(f, '8sII')
+                zones[zname] = zname2, pos, length
+
+            zname2, pos, length = zones['ORDER']
+            f.seek(pos, 0)
+            code = np.fromfile(f, dtype='u2', count=n_chan)
+
+            for c in range(n_chan):
+                zname2, pos, length = zones['LABCOD']
+                f.seek(pos + code[c] * 128 + 2, 0)
+
+                chan.append(f.read(6).decode('utf-8').strip())
+                # Skip the name of the ground channel :
+                f.seek(6, 1)
+                logical_min, logical_max, logic_ground_chan, physical_min, \
+                    physical_max = read_f(f, 'iiiii')
+
+                logical_ground.append(logic_ground_chan)
+
+                gain.append(float(physical_max - physical_min) /
+                            float(logical_max - logical_min + 1))
+
+        # Multiplexed unsigned samples :
+        n_samples = int((os.path.getsize(path) - data_start_offset) /
+                        (nbytes * n_chan))
+
+        self.path = path
+        self._raw = np.memmap(path, dtype='<u' + str(nbytes), mode='r',
+                              offset=data_start_offset,
+                              shape=(n_samples, n_chan))
+        self._ground = np.array(logical_ground,
+                                dtype=np.float32)[:, np.newaxis]
+        self._gain = np.array(gain, dtype=np.float32)[:, np.newaxis]
+
+        RecordingSource.__init__(self, sf, chan, n_samples, start_time,
+                                 downsample, channels)
+
+    def _read(self, idx, start, stop, out=None):
+        """Read, remove the logical ground and multiply by gain.
+
+        The calibration is applied in place in the (preallocated) float32
+        output, without any intermediate full-size copy of the raw samples.
+        """
+        if out is None:
+            out = np.empty((len(idx), stop - start), dtype=np.float32)
+        np.subtract(self._raw[start:stop, idx].T, self._ground[idx, :],
+                    out=out, casting='unsafe')
+        np.multiply(out, self._gain[idx, :], out=out)
+        return out
@@ -0,0 +1,256 @@
+"""Multi-resolution (min, max) envelopes of long recordings.
+
+The envelope pyramid stores, for each channel, the minimum and the maximum
+of the signal over bins of 16, 32, 64, ... samples. Drawing a window then
+only requires the level whose number of bins matches the screen width, so
+that the cost does not depend on the duration of the window. Shorter windows
+are drawn using the raw data. All levels are stored in a single array so
+that a saved pyramid can be loaded as a memory map.
+"""
+import numpy as np
+
+__all__ = ['EnvelopePyramid']
+
+
+def _pairwise(x, fcn):
+    """Reduce consecutive pairs of samples (the last one can be alone)."""
+    if x.shape[1] % 2:
+        x = np.concatenate((x, x[:, -1:]), axis=1)
+    return fcn(x[:, 0::2], x[:, 1::2])
+
+
+def _binwise(x, size, fcn):
+    """Reduce consecutive bins of samples (the last one can be shorter)."""
+    nbins = -(-x.shape[1] // size)
+    if x.shape[1] % size:
+        pad = np.repeat(x[:, -1:], nbins * size - x.shape[1], axis=1)
+        x = np.concatenate((x, pad), axis=1)
+    return fcn.reduce(x.reshape(x.shape[0], nbins, size), axis=2)
+
+
+class EnvelopePyramid(object):
+    """Pyramid of (min, max) envelopes at power-of-two decimation levels.
+
+    The level k contains the (min, max) of each bin of 2 ** k samples, for k
+    from first_level up to the level of min_bins bins. The pyramid is built
+    chunk by chunk so that data can be a recording source.
+
+    Args:
+        data: np.ndarray | RecordingSource
+            Data of shape (n_channels, n_points).
+
+    Kargs:
+        min_bins: int, optional, (def: 256)
+            Number of bins of the coarsest level.
+
+        chunk: int, optional, (def: 2 ** 20)
+            Number of samples read at once.
+
+        first_level: int, optional, (def: 4)
+            Level of the finest envelope (bins of 2 ** first_level samples).
+            The pyramid takes 1 / 2 ** (first_level - 2) of the data size.
+    """
+
+    def __init__(self, data=None, min_bins=256, chunk=2 ** 20,
+                 first_level=4):
+        """Init."""
+        self.min, self.max = [], []
+        self.env = np.empty((2, 0, 0), dtype=np.float32)
+        self.npts = 0
+        self.first_level = int(first_level)
+        # Multiplicative factor of data (see RecordingSource.scale) :
+        self.scale = 1.
+        self._factor = 1.
+        if data is not None:
+            self.build(data, min_bins, chunk)
+
+    def __len__(self):
+        """Return the number of levels (without the raw data)."""
+        return len(self.min)
+
+    def _set_env(self, env, nlevels):
+        """Set the (2, n_channels, n_bins) array of all envelopes."""
+        self.env, self.min, self.max = env, [], []
+        o = 0
+        for k in range(self.first_level, self.first_level + nlevels):
+            n = -(-self.npts // 2 ** k)
+            self.min.append(env[0, :, o:o + n])
+            self.max.append(env[1, :, o:o + n])
+            o += n
+
+    def build(self, data, min_bins=256, chunk=2 ** 20):
+        """Build the pyramid.
+
+        Args:
+            data: np.ndarray | RecordingSource
+                Data of shape (n_channels, n_points).
+
+        Kargs:
+            min_bins: int, optional, (def: 256)
+                Number of bins of the coarsest level.
+
+            chunk: int, optional, (def: 2 ** 20)
+                Number of samples read at once.
+        """
+        nchan, npts = data.shape
+        self.npts = npts
+        self.scale, self._factor = float(getattr(data, 'scale', 1.)), 1.
+        first = self.first_level
+        last = max(int(np.floor(np.log2(max(npts / min_bins, 1)))), first)
+        nlevels = last - first + 1
+        nbins = sum([-(-npts // 2 ** k) for k in range(first, last + 1)])
+        self._set_env(np.empty((2, nchan, nbins), dtype=np.float32), nlevels)
+        # Chunks are aligned on the bins of the coarsest level :
+        step = max(chunk // 2 ** last, 1) * 2 ** last
+        for k in range(0, npts, step):
+            x = np.asarray(data[:, k:k + step], dtype=np.float32)
+            mn = _binwise(x, 2 ** first, np.minimum)
+            mx = _binwise(x, 2 ** first, np.maximum)
+            for lev in range(nlevels):
+                if lev:
+                    mn = _pairwise(mn, np.minimum)
+                    mx = _pairwise(mx, np.maximum)
+                o = k // 2 ** (first + lev)
+                self.min[lev][:, o:o + mn.shape[1]] = mn
+                self.max[lev][:, o:o + mx.shape[1]] = mx
+
+    def rescale(self, scale):
+        """Update envelopes for a new multiplicative factor of the data.
+
+        Envelopes are not modified (they can be a read-only memory map) :
+        the factor is applied to each returned window.
+
+        Args:
+            scale: float
+                The new (positive) multiplicative factor.
+        """
+        self._factor = float(scale) / self.scale
+
+    def level(self, npts, nbins):
+        """Get the level to use to draw npts samples using at most nbins.
+
+        Args:
+            npts: int
+                Number of samples of the window.
+
+            nbins: int
+                Maximum number of bins.
+
+        Returns:
+            level: int
+                The level (0 for the raw data).
+        """
+        lev = int(np.ceil(np.log2(max(npts / nbins, 1))))
+        if not len(self) or (lev < self.first_level):
+            return 0
+        return min(lev, self.first_level + len(self) - 1)
+
+    def envelope(self, chans, start, stop, nbins):
+        """Get the (min, max) envelope of a window.
+
+        Args:
+            chans: slice | list | np.ndarray
+                Channel selection.
+
+            start: int
+                Index of the first sample.
+
+            stop: int
+                Index of the last sample (excluded).
+
+            nbins: int
+                Maximum number of bins.
+
+        Returns:
+            index: np.ndarray
+                Index of the first sample of each bin.
+
+            emin: np.ndarray
+                Minimum of each bin of shape (n_channels, n_bins).
+
+            emax: np.ndarray
+                Maximum of each bin of shape (n_channels, n_bins).
+        """
+        lev = self.level(stop - start, nbins)
+        if lev == 0:
+            raise ValueError("The window is small enough to be drawn using "
+                             "the raw data.")
+        bsta, bend = start >> lev, -(-stop // 2 ** lev)
+        index = np.arange(bsta, bend) * 2 ** lev
+        index[0] = start
+        ilev = lev - self.first_level
+        emin = self.min[ilev][chans, bsta:bend]
+        emax = self.max[ilev][chans, bsta:bend]
+        if self._factor != 1.:
+            emin, emax = emin * self._factor, emax * self._factor
+        return index, emin, emax
+
+    def line(self, chans, start, stop, nbins):
+        """Get a line drawing the envelope of a window.
+
+        Both the minimum and the maximum of each bin are used so that the
+        line covers the full amplitude of the signal.
+
+        Args:
+            chans: slice | list | np.ndarray
+                Channel selection.
+
+            start: int
+                Index of the first sample.
+
+            stop: int
+                Index of the last sample (excluded).
+
+            nbins: int
+                Maximum number of bins.
+
+        Returns:
+            index: np.ndarray
+                Sample index of each point of the line (2 * n_bins).
+
+            data: np.ndarray
+                Data of shape (n_channels, 2 * n_bins).
+        """
+        index, emin, emax = self.envelope(chans, start, stop, nbins)
+        data = np.empty((emin.shape[0], 2 * emin.shape[1]), dtype=np.float32)
+        data[:, 0::2], data[:, 1::2] = emin, emax
+        return np.repeat(index, 2), data
+
+    def save(self, filename):
+        """Save the pyramid.
+
+        Envelopes are saved into filename + '.npy' and the other attributes
+        into filename + '.npz'.
+
+        Args:
+            filename: str
+                Filename (with full path) without extension.
+        """
+        np.save(filename + '.npy', self.env)
+        np.savez(filename + '.npz', npts=self.npts, scale=self.scale,
+                 first_level=self.first_level, nlevels=len(self))
+
+    @classmethod
+    def load(cls, filename, mmap_mode='r'):
+        """Load a pyramid saved with the save() method.
+
+        Args:
+            filename: str
+                Filename (with full path) without extension.
+
+        Kargs:
+            mmap_mode: str, optional, (def: 'r')
+                Memory map mode of envelopes (see np.load).
+
+        Returns:
+            pyramid: EnvelopePyramid
+                The loaded pyramid.
+        """
+        with np.load(filename + '.npz') as arch:
+            pyramid = cls(first_level=int(arch['first_level']))
+            pyramid.npts = int(arch['npts'])
+            pyramid.scale = float(arch['scale'])
+            nlevels = int(arch['nlevels'])
+        pyramid._set_env(np.load(filename + '.npy', mmap_mode=mmap_mode),
+                         nlevels)
+        return pyramid
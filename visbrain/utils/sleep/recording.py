@@ -0,0 +1,507 @@
+"""Lazy access to sleep recordings.
+
+A recording source wraps a sleep dataset (a file on disk or an array) and
+serves (channels, samples) windows on demand. Only the header is read when the
+source is created. Data are read, calibrated and down-sampled window by window
+so that the memory usage is bounded by the window size and not by the length
+of the recording. When down-sampling, an anti-aliasing FIR filter is applied
+chunk by chunk (polyphase filtering) before decimation.
+
+- RecordingSource : base class of all sources
+- ArraySource : source from an in-memory array
+- MixedSource : linear combination of the channels of another source
+- MneRawSource : mne.io.Raw created without preloading data
+
+Sources of sleep files (ElanSource, EdfSource, BrainVisionSource and
+MicromedSource) are defined in their own module, only imported when a file of
+this format is opened (see visbrain.io.open_recording).
+"""
+import datetime
+import numpy as np
+from scipy.signal import firwin, upfirdn
+
+from ..others import check_downsampling
+
+__all__ = ['RecordingSource', 'ArraySource', 'MixedSource', 'MneRawSource']
+
+
+def _antialias_filter(ds):
+    """Get the anti-aliasing FIR filter used to decimate by a factor ds.
+
+    The filter is a Hamming-windowed low-pass filter of 20 * ds + 1 taps with
+    a cutoff at the new Nyquist frequency (same design as
+    scipy.signal.decimate with ftype='fir').
+
+    Args:
+        ds: int
+            The decimation factor.
+
+    Returns:
+        h: np.ndarray
+            The float32 filter coefficients.
+    """
+    return firwin(20 * ds + 1, 1. / ds, window='hamming').astype(np.float32)
+
+
+class RecordingSource(object):
+    """Lazy (n_channels, n_points) recording.
+
+    The source behaves like a read-only 2D array of down-sampled data : it
+    has a shape and it can be indexed using source[channels, time]. Each
+    indexing only reads the requested window.
+
+    Subclasses have to implement the _read() method which returns calibrated
+    float32 data of a list of channels for a range of samples at the original
+    sampling frequency.
+
+    Args:
+        sf: float
+            The original sampling frequency.
+
+        channels: list
+            List of channel names.
+
+        N: int
+            Number of samples at the original sampling frequency.
+
+    Kargs:
+        start_time: datetime.time, optional, (def: None)
+            Starting time of the recording.
+
+        downsample: float, optional, (def: None)
+            The downsampling frequency.
+
+        picks: list, optional, (def: None)
+            List of channel names (or indices) to keep. Other channels are
+            never read. If None, all channels are kept.
+    """
+
+    # Number of original samples read at once :
+    chunk = 2 ** 18
+
+    def __init__(self, sf, channels, N, start_time=None, downsample=None,
+                 picks=None):
+        """Init."""
+        self.sfori = float(sf)
+        self.channels = list(channels)
+        # Indices of the kept channels in the file :
+        self._picks = np.arange(len(self.channels))
+        if picks is not None:
+            self.select(picks)
+        self.N = int(N)
+        if start_time is None:
+            start_time = datetime.time(0, 0, 0)
+        self.start_time = start_time
+        # Get downsample factor :
+        if downsample is not None:
+            # Check down-sampling :
+            downsample = check_downsampling(sf, downsample)
+            self.ds = int(np.round(sf / downsample))
+        else:
+            self.ds = 1
+        self.downsample = downsample
+        self.sf = self.sfori / self.ds
+        # Multiplicative factor applied on each window :
+        self.scale = 1.
+
+    def __len__(self):
+        """Return the number of channels."""
+        return len(self.channels)
+
+    def __array__(self, dtype=None, copy=None):
+        """Read the entire recording."""
+        data = self.read()
+        return data if dtype is None else data.astype(dtype, copy=False)
+
+    def __getitem__(self, key):
+        """Read a window using source[channels, time]."""
+        if not isinstance(key, tuple):
+            key = (key, slice(None))
+        ckey, tkey = [slice(None) if k is Ellipsis else k for k in key]
+        npts = self.shape[1]
+        # Channel selection :
+        idx = np.arange(len(self))[ckey]
+        squeeze = idx.ndim == 0
+        idx = np.atleast_1d(idx)
+        # Time selection :
+        if isinstance(tkey, slice):
+            start, stop, step = tkey.indices(npts)
+            if step > 0:
+                data = self.read(idx, start, stop)[:, ::step]
+            else:
+                data = self.read(idx, stop + 1, start + 1)[:, ::step]
+        elif np.ndim(tkey) == 0:
+            t = int(tkey) + npts * (int(tkey) < 0)
+            if not 0 <= t < npts:
+                raise IndexError("index " + str(tkey) + " is out of bounds "
+                                 "for axis 1 with size " + str(npts))
+            data = self.read(idx, t, t + 1)[:, 0]
+        else:
+            t = np.asarray(tkey)
+            if t.dtype == bool:
+                t = np.where(t)[0]
+            t = np.where(t < 0, t + npts, t).astype(int)
+            if not t.size:
+                data = np.empty((len(idx), 0), dtype=np.float32)
+            else:
+                data = self.read(idx, t.min(), t.max() + 1)[:, t - t.min()]
+        return data[0, ...] if squeeze else data
+
+    # -------------------------------------------------------------------------
+    # PROPERTIES
+    # -------------------------------------------------------------------------
+    @property
+    def shape(self):
+        """Get the (n_channels, n_points) down-sampled shape."""
+        return (len(self), int(np.ceil(self.N / self.ds)))
+
+    @property
+    def ndim(self):
+        """Get the number of dimensions."""
+        return 2
+
+    @property
+    def dtype(self):
+        """Get the data type of returned windows."""
+        return np.dtype(np.float32)
+
+    # -------------------------------------------------------------------------
+    # READING
+    # -------------------------------------------------------------------------
+    def _read(self, idx, start, stop, out=None):
+        """Read calibrated data at the original sampling frequency.
+
+        Args:
+            idx: np.ndarray
+                Array of channel indices.
+
+            start: int
+                Index of the first original sample.
+
+            stop: int
+                Index of the last original sample (excluded).
+
+        Kargs:
+            out: np.ndarray, optional, (def: None)
+                A preallocated (len(idx), stop - start) float32 array in
+                which calibrated data are written.
+
+        Returns:
+            data: np.ndarray
+                Float32 array of shape (len(idx), stop - start).
+        """
+        raise NotImplementedError
+
+    def select(self, channels):
+        """Only keep a subset of channels.
+
+        Args:
+            channels: list
+                List of channel names (or indices) to keep.
+        """
+        idx = self._chan_index(channels)
+        if not len(idx):
+            raise ValueError("At least one channel must be selected.")
+        self._picks = self._picks[idx]
+        self.channels = [self.channels[k] for k in idx]
+
+    def _chan_index(self, chans):
+        """Convert channel names or indices into an array of indices."""
+        if chans is None:
+            return np.arange(len(self))
+        for k in chans:
+            if isinstance(k, str) and k not in self.channels:
+                raise ValueError("Channel " + k + " not found in " +
+                                 str(self.channels))
+        return np.array([self.channels.index(k) if isinstance(k, str) else k
+                         for k in chans], dtype=int)
+
+    def read(self, chans=None, start=0, stop=None, out=None):
+        """Read a window of down-sampled data.
+
+        Kargs:
+            chans: list, optional, (def: None)
+                List of channel names or indices. If None, all channels are
+                read.
+
+            start: int, optional, (def: 0)
+                Index of the first down-sampled point.
+
+            stop: int, optional, (def: None)
+                Index of the last down-sampled point (excluded). If None, read
+                up to the end of the recording.
+
+            out: np.ndarray, optional, (def: None)
+                A preallocated (n_channels, stop - start) float32 array.
+
+        Returns:
+            data: np.ndarray
+                The float32 data of shape (n_channels, stop - start).
+        """
+        idx = self._picks[self._chan_index(chans)]
+        npts = self.shape[1]
+        start = min(max(int(start), 0), npts)
+        stop = npts if stop is None else min(max(int(stop), start), npts)
+        if out is None:
+            out = np.empty((len(idx), stop - start), dtype=np.float32)
+        if stop > start:
+            self._read_window(idx, start, stop, out)
+        if self.scale != 1.:
+            np.multiply(out, self.scale, out=out)
+        return out
+
+    def read_header(self):
+        """Get the header informations of the recording.
+
+        The header is parsed when the source is created, so that no data
+        are read by this method.
+
+        Returns:
+            header: dict
+                Dictionary with the original sampling frequency 'sf', the
+                down-sampled sampling frequency 'downsample', the number of
+                original samples 'N', the list of 'channels' and the
+                'start_time'.
+        """
+        return {'sf': self.sfori, 'downsample': self.sf, 'N': self.N,
+                'channels': list(self.channels),
+                'start_time': self.start_time}
+
+    def read_window(self, start, stop, chans=None, out=None):
+        """Read a window of down-sampled data.
+
+        Args:
+            start: int
+                Index of the first down-sampled point.
+
+            stop: int
+                Index of the last down-sampled point (excluded).
+
+        Kargs:
+            chans: list, optional, (def: None)
+                List of channel names or indices. If None, all channels are
+                read.
+
+            out: np.ndarray, optional, (def: None)
+                A preallocated (n_channels, stop - start) float32 array.
+
+        Returns:
+            data: np.ndarray
+                The float32 data of shape (n_channels, stop - start).
+        """
+        return self.read(chans, start, stop, out)
+
+    def _read_window(self, idx, start, stop, out):
+        """Read a window of down-sampled data of file channels into out."""
+        if self.ds == 1:
+            self._read_chunks(idx, start, stop, out)
+        else:
+            self._decimate_chunks(idx, start, stop, out)
+
+    def _read_chunks(self, idx, start, stop, out):
+        """Read original samples chunk by chunk (no down-sampling)."""
+        for k in range(start, stop, self.chunk):
+            end = min(k + self.chunk, stop)
+            self._read(idx, k, end, out=out[:, k - start:end - start])
+
+    def _read_padded(self, idx, start, stop):
+        """Read original samples, padding out of bounds with edge values."""
+        beg = min(max(start, 0), self.N - 1)
+        end = max(min(stop, self.N), beg + 1)
+        data = self._read(idx, beg, end)
+        if (beg, end) != (start, stop):
+            data = data[:, np.clip(np.arange(start, stop), beg, end - 1) - beg]
+        return data
+
+    def _decimate_chunks(self, idx, start, stop, out):
+        """Low-pass filter and decimate original samples chunk by chunk.
+
+        The output point j is the filtered signal centered on the original
+        sample j * ds. Chunks are filtered using a polyphase implementation
+        and the last 2 * m samples of each chunk (where m is the half length
+        of the filter) are carried over to the next one so that the result
+        does not depend on the chunk size.
+        """
+        ds = self.ds
+        h = _antialias_filter(ds)
+        m = (len(h) - 1) // 2
+        # Original samples needed (including the filter margins) :
+        beg, end = start * ds - m, (stop - 1) * ds + m + 1
+        step = max(self.chunk // ds, 1) * ds
+        buf, o = np.empty((len(idx), 0), dtype=np.float32), 0
+        for k in range(beg, end, step):
+            buf = np.concatenate((buf, self._read_padded(
+                idx, k, min(k + step, end))), axis=1)
+            # Number of output points fully covered by the buffer :
+            n = (buf.shape[1] - 1 - 2 * m) // ds + 1
+            if n <= 0:
+                continue
+            dec = upfirdn(h, buf, down=ds, axis=-1)
+            out[:, o:o + n] = dec[:, 2 * m // ds:2 * m // ds + n]
+            buf, o = buf[:, n * ds:], o + n
+
+    def stats(self):
+        """Get the min, max, std, mean and dist of each channel.
+
+        Statistics are computed chunk by chunk over the down-sampled data.
+
+        Returns:
+            info: dict
+                Dictionary of float32 vectors of length n_channels.
+        """
+        nchan, npts = self.shape
+        dmin = np.full((nchan,), np.inf)
+        dmax = np.full((nchan,), -np.inf)
+        mean, m2, count = np.zeros((nchan,)), np.zeros((nchan,)), 0
+        step = max(self.chunk // self.ds, 1)
+        for k in range(0, npts, step):
+            x = self.read(None, k, k + step).astype(np.float64)
+            n = x.shape[1]
+            np.minimum(dmin, x.min(1), out=dmin)
+            np.maximum(dmax, x.max(1), out=dmax)
+            # Merge mean / variance of the chunk (Chan et al.) :
+            xmean = x.mean(1)
+            xm2 = np.square(x - xmean[:, np.newaxis]).sum(1)
+            delta = xmean - mean
+            mean += delta * n / (count + n)
+            m2 += xm2 + np.square(delta) * count * n / (count + n)
+            count += n
+        std = np.sqrt(m2 / max(count, 1))
+        info = {'min': dmin, 'max': dmax, 'std': std, 'mean': mean,
+                'dist': dmax - dmin}
+        return {k: v.astype(np.float32) for k, v in info.items()}
+
+    def combine(self, mix, channels):
+        """Get a source of linearly combined channels.
+
+        Args:
+            mix: np.ndarray
+                Mixing matrix of shape (n_new_channels, n_channels).
+
+            channels: list
+                List of the new channel names.
+
+        Returns:
+            source: MixedSource
+                The combined source.
+        """
+        return MixedSource(self, mix, channels)
+
+
+class ArraySource(RecordingSource):
+    """Recording source from an in-memory array.
+
+    Args:
+        data: np.ndarray
+            Array of data of shape (n_channels, n_points).
+
+        sf: float
+            The sampling frequency.
+
+    Kargs:
+        channels: list, optional, (def: None)
+            List of channel names.
+
+        start_time: datetime.time, optional, (def: None)
+            Starting time of the recording.
+
+        downsample: float, optional, (def: None)
+            The downsampling frequency.
+    """
+
+    def __init__(self, data, sf, channels=None, start_time=None,
+                 downsample=None):
+        """Init."""
+        if channels is None:
+            channels = ['chan' + str(k) for k in range(data.shape[0])]
+        self._data = data
+        RecordingSource.__init__(self, sf, channels, data.shape[1],
+                                 start_time, downsample)
+
+    def _read(self, idx, start, stop, out=None):
+        """Read data from the array."""
+        if out is None:
+            return self._data[idx, start:stop].astype(np.float32, copy=False)
+        out[...] = self._data[idx, start:stop]
+        return out
+
+
+class MixedSource(RecordingSource):
+    """Linear combination of the channels of a recording source.
+
+    This source is used for re-referencing, common average and
+    bipolarization : each window of new channels is computed from the needed
+    channels of the parent source only.
+
+    Args:
+        source: RecordingSource
+            The parent source.
+
+        mix: np.ndarray
+            Mixing matrix of shape (n_new_channels, n_channels).
+
+        channels: list
+            List of the new channel names.
+    """
+
+    def __init__(self, source, mix, channels):
+        """Init."""
+        # Avoid nested combinations :
+        if isinstance(source, MixedSource):
+            mix = np.dot(mix, source.mix[source._picks, :])
+            source = source.source
+        self.source = source
+        self.mix = np.asarray(mix, dtype=np.float32)
+        RecordingSource.__init__(self, source.sf, channels, source.shape[1],
+                                 source.start_time)
+
+    def _read(self, idx, start, stop, out=None):
+        """Read needed channels from the parent source and combine them."""
+        mix = self.mix[idx, :]
+        used = np.where(np.any(mix != 0., axis=0))[0]
+        data = np.dot(mix[:, used], self.source.read(used, start, stop))
+        if out is None:
+            return data
+        out[...] = data
+        return out
+
+
+class MneRawSource(RecordingSource):
+    """Recording source from a MNE Raw object.
+
+    The Raw object should be created with preload=False : windows are then
+    pulled from the file using raw.get_data(picks, start, stop) so that the
+    dataset is never loaded at once.
+
+    Args:
+        raw: mne.io.Raw
+            The MNE Raw object.
+
+    Kargs:
+        downsample: float, optional, (def: None)
+            The downsampling frequency.
+
+        channels: list, optional, (def: None)
+            List of channel names (or indices) to read.
+    """
+
+    def __init__(self, raw, downsample=None, channels=None):
+        """Init."""
+        self._raw = raw
+        # Starting time (the measurement date can be missing) :
+        meas_date = raw.info['meas_date']
+        if isinstance(meas_date, datetime.datetime):
+            start_time = meas_date.time().replace(microsecond=0)
+        else:
+            start_time = None
+        RecordingSource.__init__(self, raw.info['sfreq'], raw.ch_names,
+                                 raw.n_times, start_time, downsample,
+                                 channels)
+
+    def _read(self, idx, start, stop, out=None):
+        """Read samples of the selected channels through MNE."""
+        data = self._raw.get_data(picks=idx, start=start, stop=stop)
+        if out is None:
+            return data.astype(np.float32)
+        out[...] = data
+        return out